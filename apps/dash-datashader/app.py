@@ -1,8 +1,9 @@
-from collections import OrderedDict
+import functools
+import math
 import dash
 import dash_core_components as dcc
 import dash_html_components as html
-from dash.dependencies import Input, Output
+from dash.dependencies import ClientsideFunction, Input, Output, State
 import datashader as ds
 import datashader.transfer_functions as tf
 import pandas as pd
@@ -43,19 +44,104 @@ df = pd.DataFrame(data)
 time_start = df["Time"].values[0]
 time_end = df["Time"].values[-1]
 
-cvs = ds.Canvas(x_range=x_range, y_range=y_range)
 
-aggs = OrderedDict((c, cvs.line(df, "Time", c)) for c in cols)
-img = tf.shade(aggs["Signal"])
+def time_rows(x0, x1):
+    """
+    Rows between two times, found by binary search since Time is sorted
 
-arr = np.array(img)
-z = arr.tolist()
+    :params x0: first time, included
+    :params x1: last time, included
+    :returns: slice of the rows, to count them or take them without copy
+    """
 
-# axes
-dims = len(z[0]), len(z)
+    times = df["Time"].values
+    return slice(
+        int(np.searchsorted(times, x0, side="left")),
+        int(np.searchsorted(times, x1, side="right")),
+    )
 
-x = np.linspace(x_range[0], x_range[1], dims[0])
-y = np.linspace(y_range[0], y_range[1], dims[0])
+
+def decimate(times, values, width):
+    """
+    Smallest and largest value of each pixel column, in time order.
+
+    A line through these points spans the same values as one through all of
+    them in every column, spikes included, with at most two points per column.
+
+    :params times: sorted times
+    :params values: values at each time
+    :params width: number of pixel columns
+    :returns: (times, values) of the points kept
+    """
+
+    width = max(width, 1)
+    if len(times) <= 2 * width:
+        return times, values
+    span = max(times[-1] - times[0], 1e-9)
+    columns = np.minimum(((times - times[0]) / span * width).astype(int), width - 1)
+    order = np.lexsort((values, columns))  # by column, then by value
+    ends = np.flatnonzero(np.diff(columns[order]))  # last row of each column
+    first = np.r_[0, ends + 1]
+    last = np.r_[ends, len(order) - 1]
+    keep = np.unique(np.concatenate([order[first], order[last]]))
+    return times[keep], values[keep]
+
+
+# Size of the plot area of the graphs until the browser reports it
+default_viewport = {"width": 800, "height": 180}
+
+
+@functools.lru_cache(maxsize=32)
+def aggregate(start, stop, exponent, width, height):
+    """
+    Shaded line aggregation of the signal, cached by quantized range and size
+
+    :params start: first time, in steps of 2 ** exponent
+    :params stop: last time, in steps of 2 ** exponent
+    :params exponent: base 2 logarithm of the step
+    :params width: width of the canvas in pixels
+    :params height: height of the canvas in pixels
+    :returns: (x range, shaded image array)
+    """
+
+    step = 2.0 ** exponent
+    range_ = (start * step, stop * step)
+    rows = time_rows(*range_)
+    # one more row on each side draws the lines crossing the edges
+    visible = df.iloc[max(rows.start - 1, 0) : rows.stop + 1]
+    cvs = ds.Canvas(
+        plot_width=width, plot_height=height, x_range=range_, y_range=y_range
+    )
+    img = tf.shade(cvs.line(visible, "Time", cols[0]))
+    return range_, np.array(img)
+
+
+def rasterize(x0, x1, width, height):
+    """
+    Heatmap of the signal between two times at the size of the viewport.
+
+    The range is widened to a power of two fraction of a pixel, so that
+    ranges within a pixel of each other share the cached aggregation.
+
+    :returns: dict of heatmap x, y and z
+    """
+
+    width, height = max(int(width), 1), max(int(height), 1)
+    exponent = math.floor(math.log2(max(x1 - x0, 1e-9) / width))
+    step = 2.0 ** exponent
+    range_, arr = aggregate(
+        math.floor(x0 / step), math.ceil(x1 / step), exponent, width, height
+    )
+    return {
+        "x": np.linspace(range_[0], range_[1], width),
+        "y": np.linspace(y_range[0], y_range[1], height),
+        "z": arr.tolist(),
+    }
+
+
+raster = rasterize(
+    x_range[0], x_range[1], default_viewport["width"], default_viewport["height"]
+)
 
 # Layout
 
@@ -75,9 +161,9 @@ server = app.server
 fig1 = {
     "data": [
         {
-            "x": x,
-            "y": y,
-            "z": z,
+            "x": raster["x"],
+            "y": raster["y"],
+            "z": raster["z"],
             "type": "heatmap",
             "showscale": False,
             "colorscale": [[0, "rgba(255, 255, 255,0)"], [1, "#a3a7b0"]],
@@ -110,9 +196,9 @@ fig1 = {
 fig2 = {
     "data": [
         {
-            "x": x,
-            "y": y,
-            "z": z,
+            "x": raster["x"],
+            "y": raster["y"],
+            "z": raster["z"],
             "type": "heatmap",
             "showscale": False,
             "colorscale": [[0, "rgba(255, 255, 255,0)"], [1, "#75baf2"]],
@@ -173,6 +259,7 @@ app.layout = html.Div(
                         dcc.Graph(
                             id="graph-1", figure=fig1, config={"doubleClick": "reset"}
                         ),
+                        dcc.Store(id="graph-1-viewport"),
                     ],
                     className="twelve columns",
                 )
@@ -218,8 +305,8 @@ def selectionRange(selection):
     ):
         x0 = selection["xaxis.range[0]"]
         x1 = selection["xaxis.range[1]"]
-        sub_df = df[(df.Time >= x0) & (df.Time <= x1)]
-        num_pts = len(sub_df)
+        rows = time_rows(x0, x1)
+        num_pts = rows.stop - rows.start
         if num_pts < max_points:
             number = "{:,}".format(
                 abs(int(selection["xaxis.range[1]"]) - int(selection["xaxis.range[0]"]))
@@ -251,8 +338,8 @@ def selectionHighlight(selection):
     ):
         x0 = selection["xaxis.range[0]"]
         x1 = selection["xaxis.range[1]"]
-        sub_df = df[(df.Time >= x0) & (df.Time <= x1)]
-        num_pts = len(sub_df)
+        rows = time_rows(x0, x1)
+        num_pts = rows.stop - rows.start
         if num_pts < max_points:
             shape = dict(
                 type="rect",
@@ -274,38 +361,40 @@ def selectionHighlight(selection):
     return new_fig2
 
 
-@app.callback(Output("graph-1", "figure"), [Input("graph-1", "relayoutData")])
-def draw_undecimated_data(selection):
-    if (
-        selection is not None
-        and "xaxis.range[0]" in selection
-        and "xaxis.range[1]" in selection
-        and len(
-            df[
-                (df.Time >= selection["xaxis.range[0]"])
-                & (df.Time <= selection["xaxis.range[1]"])
-            ]
+app.clientside_callback(
+    ClientsideFunction(namespace="clientside", function_name="viewport"),
+    Output("graph-1-viewport", "data"),
+    [Input("graph-1", "relayoutData")],
+    [State("graph-1", "id")],
+)
+
+
+@app.callback(Output("graph-1", "figure"), [Input("graph-1-viewport", "data")])
+def draw_undecimated_data(viewport):
+    viewport = viewport or default_viewport
+    x0, x1 = viewport.get("x_range") or (time_start, time_end)
+    sub_df = df.iloc[time_rows(x0, x1)]
+    if len(sub_df) < max_points:
+        x, y = decimate(
+            sub_df["Time"].values, sub_df["Signal"].values, int(viewport["width"])
         )
-        < max_points
-    ):
-        x0 = selection["xaxis.range[0]"]
-        x1 = selection["xaxis.range[1]"]
-        sub_df = df[(df.Time >= x0) & (df.Time <= x1)]
-        num_pts = len(sub_df)
-        new_fig1 = fig1.copy()
         high_res_data = [
             dict(
-                x=sub_df["Time"],
-                y=sub_df["Signal"],
+                x=x,
+                y=y,
                 type="scattergl",
                 marker=dict(sizemin=1, sizemax=30, color="#a3a7b0"),
             )
         ]
-        high_res_layout = new_fig1["layout"]
-        high_res = dict(data=high_res_data, layout=high_res_layout)
     else:
-        high_res = fig1.copy()
-    return high_res
+        # re-aggregate the visible range instead of stretching the full one
+        high_res_data = [
+            dict(
+                fig1["data"][0],
+                **rasterize(x0, x1, viewport["width"], viewport["height"])
+            )
+        ]
+    return dict(data=high_res_data, layout=fig1["layout"])
 
 
 if __name__ == "__main__":
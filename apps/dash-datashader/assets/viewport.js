@@ -0,0 +1,21 @@
+/* size and x range of the plot area of a graph, read after each relayout */
+
+if(!window.dash_clientside) {window.dash_clientside = {};}
+window.dash_clientside.clientside = {
+   viewport: function (relayoutData, id) {
+       var graph = document.getElementById(id);
+       if (graph && !graph.classList.contains("js-plotly-plot")) {
+           graph = graph.querySelector(".js-plotly-plot");
+       }
+       if (!graph || !graph._fullLayout) {
+           return null;
+       }
+       var size = graph._fullLayout._size;
+       var reset = relayoutData && relayoutData["xaxis.autorange"];
+       return {
+           width: Math.round(size.w),
+           height: Math.round(size.h),
+           x_range: reset ? null : graph._fullLayout.xaxis.range
+       };
+   }
+}
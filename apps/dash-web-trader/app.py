@@ -1,8 +1,8 @@
 # -*- coding: utf-8 -*-
 import json
 import base64
-import datetime
-import requests
+import os
+import uuid
 import pathlib
 import math
 import pandas as pd
@@ -13,8 +13,18 @@ import dash_html_components as html
 import plotly.plotly as py
 import plotly.graph_objs as go
 
-from dash.dependencies import Input, Output, State
+from dash.dependencies import ClientsideFunction, Input, Output, State
+from dash import no_update
+from dash.exceptions import PreventUpdate
 from plotly import tools
+from trader.clock import ReplayClock
+from trader.news import FileNewsSource, HttpNewsSource, NewsFeed
+from trader.ohlc import OHLCPyramid
+from trader.orders import OrderStore, trigger_levels
+from trader.registry import LRUCache, TraceRegistry
+from trader.store import TickStore
+from trader.stream import Broadcaster, EventProducer
+from trader.ticks import TickIndex
 
 
 server = flask.Flask(__name__)
@@ -25,37 +35,107 @@ app = dash.Dash(
 )
 
 PATH = pathlib.Path(__file__).parent
-DATA_PATH = PATH.joinpath("data").resolve()
-
-# Loading historical tick data
-currency_pair_data = {
-    "EURUSD": pd.read_csv(
-        DATA_PATH.joinpath("EURUSD.csv"), index_col=1, parse_dates=["Date"]
-    ),
-    "USDJPY": pd.read_csv(
-        DATA_PATH.joinpath("USDJPY.csv"), index_col=1, parse_dates=["Date"]
-    ),
-    "GBPUSD": pd.read_csv(
-        DATA_PATH.joinpath("GBPUSD.csv"), index_col=1, parse_dates=["Date"]
-    ),
-    "USDCHF": pd.read_csv(
-        DATA_PATH.joinpath("USDCHF.csv"), index_col=1, parse_dates=["Date"]
-    ),
-}
+DATA_PATH = pathlib.Path(os.environ.get("DATA_PATH", PATH.joinpath("data"))).resolve()
 
 # Currency pairs
 currencies = ["EURUSD", "USDCHF", "USDJPY", "GBPUSD"]
 
-# API Requests for news div
-news_requests = requests.get(
-    "https://newsapi.org/v2/top-headlines?sources=bbc-news&apiKey=da8e2e705b914f9f86ed2e9692e66012"
+# Memory-mapped historical tick data, converted from the CSV files on first use
+tick_store = TickStore(DATA_PATH.joinpath("ticks"), csv_path=DATA_PATH)
+tick_data = {pair: tick_store.load(pair) for pair in currencies}
+
+# Binary search index over each pair's tick timestamps
+tick_indexes = {pair: TickIndex(ticks.time) for pair, ticks in tick_data.items()}
+
+# Replay time of the tick data, shared by all the workers through a small file
+replay_clock = ReplayClock.from_env(
+    os.environ.get("REPLAY_CLOCK_FILE", tick_store.path.joinpath("replay.clock")),
+    first=min(ticks.time[0] for ticks in tick_data.values()),
+    last=max(ticks.time[-1] for ticks in tick_data.values()),
+)
+
+# Server-side order books of the trading sessions, shared by all the workers
+# through a SQLite file
+order_store = OrderStore(
+    os.environ.get("ORDERS_DB", tick_store.path.joinpath("orders.db")), currencies
 )
 
-# API Call to update news
+# Periods offered by the chart dropdowns
+chart_periods = ["5Min", "15Min", "30Min"]
+
+# Bid candles for every chart period, extended as the replay time advances
+ohlc_pyramids = {
+    pair: OHLCPyramid(tick_indexes[pair], ticks.bid, chart_periods)
+    for pair, ticks in tick_data.items()
+}
+
+# Fold the history up to now at startup, so the first chart request only pays
+# for the ticks received since
+for pyramid in ohlc_pyramids.values():
+    pyramid.advance(replay_clock.now_ns())
+
+# Headlines refreshed in the background, read from NEWS_FILE for offline runs
+news_feed = NewsFeed(
+    FileNewsSource(os.environ["NEWS_FILE"])
+    if os.environ.get("NEWS_FILE")
+    else HttpNewsSource(
+        os.environ.get("NEWS_API_KEY", "da8e2e705b914f9f86ed2e9692e66012")
+    ),
+    ttl=60,
+).start()
+
+# Market events pushed to the browsers, polled by one thread per process
+events = Broadcaster()
+event_producer = EventProducer(events, interval=0.5)
+
+
+# Replay time shown by the live clock
+@event_producer.source("clock", every=1)
+def clock_event():
+    return replay_clock.now().strftime("%H:%M:%S")
+
+
+# Quote of each pair, rendered by the bid and ask rows in the browser, at
+# most every 2 seconds like the former refresh interval
+@event_producer.source("tick", every=2)
+def tick_event():
+    t = replay_clock.now_ns()
+    return {pair: quote(pair, replay_index(pair, t)) for pair in currencies}
+
+
+# Ticks folded into the candles, refreshes the charts at most every 5 seconds
+@event_producer.source("candle", every=5)
+def candle_event():
+    t = replay_clock.now_ns()
+    stamps = {}
+    for pair, pyramid in ohlc_pyramids.items():
+        pyramid.advance(t)
+        stamp = pyramid.stamp(chart_periods[0])
+        stamps[pair] = [stamp.generation, stamp.cursor]
+    return stamps
+
+
+# Time of the last headlines refresh
+@event_producer.source("news")
+def news_event():
+    fetched_at = news_feed.snapshot()[1]
+    return fetched_at.isoformat() if fetched_at else None
+
+
+# Stream of the events the browsers subscribe to, see assets/stream.js
+@server.route(app.config.routes_pathname_prefix + "stream")
+def stream():
+    event_producer.start()
+    return flask.Response(
+        events.listen(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# Renders the latest news headlines
 def update_news():
-    json_data = news_requests.json()["articles"]
-    df = pd.DataFrame(json_data)
-    df = pd.DataFrame(df[["title", "url"]])
+    headlines, fetched_at = news_feed.snapshot()
     max_rows = 10
     return html.Div(
         children=[
@@ -63,7 +143,7 @@ def update_news():
             html.P(
                 className="p-news float-right",
                 children="Last update : "
-                + datetime.datetime.now().strftime("%H:%M:%S"),
+                + (fetched_at.strftime("%H:%M:%S") if fetched_at else "--:--:--"),
             ),
             html.Table(
                 className="table-news",
@@ -74,35 +154,30 @@ def update_news():
                                 children=[
                                     html.A(
                                         className="td-link",
-                                        children=df.iloc[i]["title"],
-                                        href=df.iloc[i]["url"],
+                                        children=title,
+                                        href=url,
                                         target="_blank",
                                     )
                                 ]
                             )
                         ]
                     )
-                    for i in range(min(len(df), max_rows))
+                    for title, url in headlines[:max_rows]
                 ],
             ),
         ]
     )
 
 
-# Returns dataset for currency pair with nearest datetime to current time
+# Returns dataset for currency pair with nearest datetime to the replay time
 def first_ask_bid(currency_pair, t):
-    t = t.replace(year=2016, month=1, day=5)
-    items = currency_pair_data[currency_pair]
-    dates = items.index.to_pydatetime()
-    index = min(dates, key=lambda x: abs(x - t))
-    df_row = items.loc[index]
-    int_index = items.index.get_loc(index)
+    int_index = tick_indexes[currency_pair].nearest(t)
+    df_row = tick_data[currency_pair].row(int_index)
     return [df_row, int_index]  # returns dataset row and index of row
 
 
 # Creates HTML Bid and Ask (Buy/Sell buttons)
 def get_row(data):
-    index = data[1]
     current_row = data[0]
 
     return html.Div(
@@ -132,12 +207,6 @@ def get_row(data):
                                 id=current_row[0] + "ask",
                                 className="three-col",
                             ),
-                            html.Div(
-                                index,
-                                id=current_row[0]
-                                + "index",  # we save index of row in hidden div
-                                style={"display": "none"},
-                            ),
                         ],
                     )
                 ],
@@ -187,35 +256,18 @@ def get_color(a, b):
         return "#da5657"
 
 
-# Replace ask_bid row for currency pair with colored values
-def replace_row(currency_pair, index, bid, ask):
-    index = index + 1  # index of new data row
-    new_row = (
-        currency_pair_data[currency_pair].iloc[index]
-        if index != len(currency_pair_data[currency_pair])
-        else first_ask_bid(currency_pair, datetime.datetime.now())
-    )  # if not the end of the dataset we retrieve next dataset row
+# Bid and ask of a tick with their colors, rendered by assets/stream.js
+def quote(currency_pair, index):
+    ticks = tick_data[currency_pair]
+    new_row = ticks.row(index)
+    previous_row = ticks.row(max(index - 1, 0))  # colors compare to previous tick
 
-    return [
-        html.P(
-            currency_pair, id=currency_pair, className="three-col"  # currency pair name
-        ),
-        html.P(
-            new_row[1].round(5),  # Bid value
-            id=new_row[0] + "bid",
-            className="three-col",
-            style={"color": get_color(new_row[1], bid)},
-        ),
-        html.P(
-            new_row[2].round(5),  # Ask value
-            className="three-col",
-            id=new_row[0] + "ask",
-            style={"color": get_color(new_row[2], ask)},
-        ),
-        html.Div(
-            index, id=currency_pair + "index", style={"display": "none"}
-        ),  # save index in hidden div
-    ]
+    return {
+        "bid": float(new_row[1].round(5)),
+        "ask": float(new_row[2].round(5)),
+        "bid_color": get_color(new_row[1], previous_row[1]),
+        "ask_color": get_color(new_row[2], previous_row[2]),
+    }
 
 
 # Display big numbers in readable format
@@ -261,127 +313,101 @@ def get_top_bar(
     ]
 
 
+# Chart styles and studies, their traces are shared by all the clients
+chart_traces = TraceRegistry(LRUCache(maxsize=512))
+
+# Closed candle dataframes the traces are built from, one per pair, period
+# and last closed candle
+trace_frames = LRUCache(maxsize=2 * len(chart_periods) * len(currencies))
+
 ####### STUDIES TRACES ######
+# Study values are streamed by the IndicatorEngine of each candle series,
+# the functions below only turn its columns into traces.
 
 # Moving average
-def moving_average_trace(df, fig):
-    df2 = df.rolling(window=5).mean()
-    trace = go.Scatter(
-        x=df2.index, y=df2["close"], mode="lines", showlegend=False, name="MA"
-    )
-    fig.append_trace(trace, 1, 1)  # plot in first row
-    return fig
+@chart_traces.register("moving_average_trace", row="overlay")
+def moving_average_trace(df):
+    return go.Scatter(x=df.index, y=df["ma"], mode="lines", showlegend=False, name="MA")
 
 
 # Exponential moving average
-def e_moving_average_trace(df, fig):
-    df2 = df.rolling(window=20).mean()
-    trace = go.Scatter(
-        x=df2.index, y=df2["close"], mode="lines", showlegend=False, name="EMA"
+@chart_traces.register("e_moving_average_trace", row="overlay")
+def e_moving_average_trace(df):
+    return go.Scatter(
+        x=df.index, y=df["ema"], mode="lines", showlegend=False, name="EMA"
     )
-    fig.append_trace(trace, 1, 1)  # plot in first row
-    return fig
 
 
 # Bollinger Bands
-def bollinger_trace(df, fig, window_size=10, num_of_std=5):
-    price = df["close"]
-    rolling_mean = price.rolling(window=window_size).mean()
-    rolling_std = price.rolling(window=window_size).std()
-    upper_band = rolling_mean + (rolling_std * num_of_std)
-    lower_band = rolling_mean - (rolling_std * num_of_std)
-
-    trace = go.Scatter(
-        x=df.index, y=upper_band, mode="lines", showlegend=False, name="BB_upper"
-    )
-
-    trace2 = go.Scatter(
-        x=df.index, y=rolling_mean, mode="lines", showlegend=False, name="BB_mean"
-    )
-
-    trace3 = go.Scatter(
-        x=df.index, y=lower_band, mode="lines", showlegend=False, name="BB_lower"
-    )
-
-    fig.append_trace(trace, 1, 1)  # plot in first row
-    fig.append_trace(trace2, 1, 1)  # plot in first row
-    fig.append_trace(trace3, 1, 1)  # plot in first row
-    return fig
+@chart_traces.register("bollinger_trace", row="overlay")
+def bollinger_trace(df):
+    return [
+        go.Scatter(x=df.index, y=df[column], mode="lines", showlegend=False, name=name)
+        for column, name in [
+            ("bb_upper", "BB_upper"),
+            ("bb_mean", "BB_mean"),
+            ("bb_lower", "BB_lower"),
+        ]
+    ]
 
 
 # Accumulation Distribution
+@chart_traces.register("accumulation_trace", row="subplot")
 def accumulation_trace(df):
-    df["volume"] = ((df["close"] - df["low"]) - (df["high"] - df["close"])) / (
-        df["high"] - df["low"]
-    )
-    trace = go.Scatter(
-        x=df.index, y=df["volume"], mode="lines", showlegend=False, name="Accumulation"
+    return go.Scatter(
+        x=df.index,
+        y=df["accumulation"],
+        mode="lines",
+        showlegend=False,
+        name="Accumulation",
     )
-    return trace
 
 
 # Commodity Channel Index
-def cci_trace(df, ndays=5):
-    TP = (df["high"] + df["low"] + df["close"]) / 3
-    CCI = pd.Series(
-        (TP - TP.rolling(window=10, center=False).mean())
-        / (0.015 * TP.rolling(window=10, center=False).std()),
-        name="cci",
+@chart_traces.register("cci_trace", row="subplot")
+def cci_trace(df):
+    return go.Scatter(
+        x=df.index, y=df["cci"], mode="lines", showlegend=False, name="CCI"
     )
-    trace = go.Scatter(x=df.index, y=CCI, mode="lines", showlegend=False, name="CCI")
-    return trace
 
 
 # Price Rate of Change
-def roc_trace(df, ndays=5):
-    N = df["close"].diff(ndays)
-    D = df["close"].shift(ndays)
-    ROC = pd.Series(N / D, name="roc")
-    trace = go.Scatter(x=df.index, y=ROC, mode="lines", showlegend=False, name="ROC")
-    return trace
+@chart_traces.register("roc_trace", row="subplot")
+def roc_trace(df):
+    return go.Scatter(
+        x=df.index, y=df["roc"], mode="lines", showlegend=False, name="ROC"
+    )
 
 
 # Stochastic oscillator %K
+@chart_traces.register("stoc_trace", row="subplot")
 def stoc_trace(df):
-    SOk = pd.Series((df["close"] - df["low"]) / (df["high"] - df["low"]), name="SO%k")
-    trace = go.Scatter(x=df.index, y=SOk, mode="lines", showlegend=False, name="SO%k")
-    return trace
+    return go.Scatter(
+        x=df.index, y=df["stoc"], mode="lines", showlegend=False, name="SO%k"
+    )
 
 
 # Momentum
-def mom_trace(df, n=5):
-    M = pd.Series(df["close"].diff(n), name="Momentum_" + str(n))
-    trace = go.Scatter(x=df.index, y=M, mode="lines", showlegend=False, name="MOM")
-    return trace
+@chart_traces.register("mom_trace", row="subplot")
+def mom_trace(df):
+    return go.Scatter(
+        x=df.index, y=df["mom"], mode="lines", showlegend=False, name="MOM"
+    )
 
 
 # Pivot points
-def pp_trace(df, fig):
-    PP = pd.Series((df["high"] + df["low"] + df["close"]) / 3)
-    R1 = pd.Series(2 * PP - df["low"])
-    S1 = pd.Series(2 * PP - df["high"])
-    R2 = pd.Series(PP + df["high"] - df["low"])
-    S2 = pd.Series(PP - df["high"] + df["low"])
-    R3 = pd.Series(df["high"] + 2 * (PP - df["low"]))
-    S3 = pd.Series(df["low"] - 2 * (df["high"] - PP))
-    trace = go.Scatter(x=df.index, y=PP, mode="lines", showlegend=False, name="PP")
-    trace1 = go.Scatter(x=df.index, y=R1, mode="lines", showlegend=False, name="R1")
-    trace2 = go.Scatter(x=df.index, y=S1, mode="lines", showlegend=False, name="S1")
-    trace3 = go.Scatter(x=df.index, y=R2, mode="lines", showlegend=False, name="R2")
-    trace4 = go.Scatter(x=df.index, y=S2, mode="lines", showlegend=False, name="S2")
-    trace5 = go.Scatter(x=df.index, y=R3, mode="lines", showlegend=False, name="R3")
-    trace6 = go.Scatter(x=df.index, y=S3, mode="lines", showlegend=False, name="S3")
-    fig.append_trace(trace, 1, 1)
-    fig.append_trace(trace1, 1, 1)
-    fig.append_trace(trace2, 1, 1)
-    fig.append_trace(trace3, 1, 1)
-    fig.append_trace(trace4, 1, 1)
-    fig.append_trace(trace5, 1, 1)
-    fig.append_trace(trace6, 1, 1)
-    return fig
+@chart_traces.register("pp_trace", row="overlay")
+def pp_trace(df):
+    return [
+        go.Scatter(
+            x=df.index, y=df[name], mode="lines", showlegend=False, name=name.upper()
+        )
+        for name in ["pp", "r1", "s1", "r2", "s2", "r3", "s3"]
+    ]
 
 
 ## MAIN CHART TRACES (STYLE tab)
+@chart_traces.register("line_trace", row="main")
 def line_trace(df):
     trace = go.Scatter(
         x=df.index, y=df["close"], mode="lines", showlegend=False, name="line"
@@ -389,6 +415,7 @@ def line_trace(df):
     return trace
 
 
+@chart_traces.register("area_trace", row="main")
 def area_trace(df):
     trace = go.Scatter(
         x=df.index, y=df["close"], showlegend=False, fill="toself", name="area"
@@ -396,20 +423,22 @@ def area_trace(df):
     return trace
 
 
-def bar_trace(df):
+@chart_traces.register("bar_trace", row="main", color="#888888")
+def bar_trace(df, color):
     return go.Ohlc(
         x=df.index,
         open=df["open"],
         high=df["high"],
         low=df["low"],
         close=df["close"],
-        increasing=dict(line=dict(color="#888888")),
-        decreasing=dict(line=dict(color="#888888")),
+        increasing=dict(line=dict(color=color)),
+        decreasing=dict(line=dict(color=color)),
         showlegend=False,
         name="bar",
     )
 
 
+@chart_traces.register("colored_bar_trace", row="main")
 def colored_bar_trace(df):
     return go.Ohlc(
         x=df.index,
@@ -422,15 +451,18 @@ def colored_bar_trace(df):
     )
 
 
-def candlestick_trace(df):
+@chart_traces.register(
+    "candlestick_trace", row="main", increasing="#00ff00", decreasing="white"
+)
+def candlestick_trace(df, increasing, decreasing):
     return go.Candlestick(
         x=df.index,
         open=df["open"],
         high=df["high"],
         low=df["low"],
         close=df["close"],
-        increasing=dict(line=dict(color="#00ff00")),
-        decreasing=dict(line=dict(color="white")),
+        increasing=dict(line=dict(color=increasing)),
+        decreasing=dict(line=dict(color=decreasing)),
         showlegend=False,
         name="candlestick",
     )
@@ -438,14 +470,26 @@ def candlestick_trace(df):
 
 # For buy/sell modal
 def ask_modal_trace(currency_pair, index):
-    df = currency_pair_data[currency_pair].iloc[index - 10 : index]  # returns ten rows
-    return go.Scatter(x=df.index, y=df["Ask"], mode="lines", showlegend=False)
+    ticks = tick_data[currency_pair]
+    rows = slice(max(index - 10, 0), index)  # ten rows
+    return go.Scatter(
+        x=pd.to_datetime(ticks.time[rows]),
+        y=ticks.ask[rows],
+        mode="lines",
+        showlegend=False,
+    )
 
 
 # For buy/sell modal
 def bid_modal_trace(currency_pair, index):
-    df = currency_pair_data[currency_pair].iloc[index - 10 : index]  # returns ten rows
-    return go.Scatter(x=df.index, y=df["Bid"], mode="lines", showlegend=False)
+    ticks = tick_data[currency_pair]
+    rows = slice(max(index - 10, 0), index)  # ten rows
+    return go.Scatter(
+        x=pd.to_datetime(ticks.time[rows]),
+        y=ticks.bid[rows],
+        mode="lines",
+        showlegend=False,
+    )
 
 
 # returns modal figure for a currency pair
@@ -468,40 +512,109 @@ def get_modal_fig(currency_pair, index):
     return fig
 
 
-# Returns graph figure
-def get_fig(currency_pair, ask, bid, type_trace, studies, period):
-    # Get OHLC data
-    data_frame = currency_pair_data[currency_pair]
-    t = datetime.datetime.now()
-    data = data_frame.loc[
-        : t.strftime(
-            "2016-01-05 %H:%M:%S"
-        )  # all the data from the beginning until current time
-    ]
-    data_bid = data["Bid"]
-    df = data_bid.resample(period).ohlc()
-
-    subplot_traces = [  # first row traces
-        "accumulation_trace",
-        "cci_trace",
-        "roc_trace",
-        "stoc_trace",
-        "mom_trace",
-    ]
+# Trace arrays that grow with the candles, extended in place in the browser
+STREAM_KEYS = ["x", "y", "open", "high", "low", "close"]
+
+# Colors plotly would give the traces by position, pinned so that the
+# history and live parts of a trace look the same
+TRACE_COLORS = [
+    "#1f77b4",
+    "#ff7f0e",
+    "#2ca02c",
+    "#d62728",
+    "#9467bd",
+    "#8c564b",
+    "#e377c2",
+    "#7f7f7f",
+    "#bcbd22",
+    "#17becf",
+]
+
+
+# Number of trailing points redrawn while the last candle is still open,
+# lines also keep the previous point to stay connected
+def live_points(trace):
+    return 1 if trace["type"] in ("ohlc", "candlestick") else 2
+
+
+# Splits trace arrays into the candles not yet sent to the browser that are
+# closed, and the trailing live points
+def split_trace(trace, skip):
+    size = len(trace["x"])
+    history, live = {}, {}
+    for key in STREAM_KEYS:
+        values = trace.get(key)
+        if values is None:
+            history[key] = live[key] = []
+        else:
+            history[key] = values[skip : max(size - 1, skip)]
+            live[key] = values[max(size - live_points(trace), 0) :]
+    return history, live
+
+
+# Returns the selected traces as (row, name) placements and the number of rows
+def chart_placements(type_trace, studies):
+    if chart_traces.get(type_trace).row != "main":
+        raise ValueError("Unknown chart style {!r}".format(type_trace))
+
     selected_subplots_studies = []
     selected_first_row_studies = []
     row = 1  # number of subplots
 
     if studies:
         for study in studies:
-            if study in subplot_traces:
+            study_row = chart_traces.get(study).row
+            if study_row == "subplot":
                 row += 1  # increment number of rows only if the study needs a subplot
                 selected_subplots_studies.append(study)
-            else:
+            elif study_row == "overlay":
                 selected_first_row_studies.append(study)
+            else:
+                raise ValueError("Unknown study {!r}".format(study))
+
+    # Main trace (style) and first row studies, then one row per subplot study
+    placements = [(1, name) for name in [type_trace] + selected_first_row_studies]
+    placements += [
+        (row, study) for row, study in enumerate(selected_subplots_studies, start=2)
+    ]
+    return placements, row
+
+
+# Advances the candles of a pair to the replay time and returns their stamp
+def chart_stamp(currency_pair, period):
+    pyramid = ohlc_pyramids[currency_pair]
+    pyramid.advance(replay_clock.now_ns())
+    return pyramid.stamp(period)
+
+
+# Returns the traces of the placements computed from the candles after start
+def chart_traces_from(currency_pair, period, stamp, placements, start):
+    pyramid = ohlc_pyramids[currency_pair]
+
+    def frame(first, stop):
+        if stop == stamp.candles:  # the forming candle, a single row
+            return pyramid.frame(period, first, stop)
+        return trace_frames.get_or_set(
+            (currency_pair, period, stamp.generation, stamp.closed, first),
+            lambda: pyramid.frame(period, first, stop),
+        )
+
+    return [
+        (row, trace)
+        for row, name in placements
+        for trace in chart_traces.traces(
+            name, currency_pair, period, stamp, frame, start
+        )
+    ]
+
+
+# Returns graph figure and the chart state describing what it contains
+def get_fig(currency_pair, type_trace, studies, period):
+    stamp = chart_stamp(currency_pair, period)
+    placements, rows = chart_placements(type_trace, studies)
 
     fig = tools.make_subplots(
-        rows=row,
+        rows=rows,
         shared_xaxes=True,
         shared_yaxes=True,
         cols=1,
@@ -509,19 +622,6 @@ def get_fig(currency_pair, ask, bid, type_trace, studies, period):
         vertical_spacing=0.12,
     )
 
-    # Add main trace (style) to figure
-    fig.append_trace(eval(type_trace)(df), 1, 1)
-
-    # Add trace(s) on fig's first row
-    for study in selected_first_row_studies:
-        fig = eval(study)(df, fig)
-
-    row = 1
-    # Plot trace on new row
-    for study in selected_subplots_studies:
-        row += 1
-        fig.append_trace(eval(study)(df), row, 1)
-
     fig["layout"][
         "uirevision"
     ] = "The User is always right"  # Ensures zoom on graph is the same on update
@@ -535,7 +635,62 @@ def get_fig(currency_pair, ask, bid, type_trace, studies, period):
     fig["layout"]["yaxis"]["gridwidth"] = 1
     fig["layout"].update(paper_bgcolor="#21252C", plot_bgcolor="#21252C")
 
-    return fig
+    # Every trace is drawn twice: closed candles that only get appended to,
+    # followed by the live points that are replaced on each refresh
+    data = []
+    candles = 0
+    traces = chart_traces_from(currency_pair, period, stamp, placements, 0)
+    for i, (row, trace) in enumerate(traces):
+        history, live = split_trace(trace, 0)
+        candles = len(history["x"])
+        if trace["type"] == "scatter":
+            line = dict(trace.get("line", {}))
+            line.setdefault("color", TRACE_COLORS[i % len(TRACE_COLORS)])
+            trace = dict(trace, line=line)
+        axes = {"xaxis": "x", "yaxis": "y" if row == 1 else "y{}".format(row)}
+        data.append(dict(trace, **history, **axes))
+        data.append(dict(trace, **live, **axes))
+
+    fig = fig.to_plotly_json()
+    fig["data"] = data
+    state = {
+        "key": [type_trace, period, studies or []],
+        "stamp": list(stamp),
+        "candles": candles,
+    }
+    return fig, state
+
+
+# Returns extendData bringing a figure described by state up to date and the
+# new state, or None when the figure has to be rebuilt
+def get_fig_delta(currency_pair, type_trace, studies, period, state):
+    if state is None or state["key"] != [type_trace, period, studies or []]:
+        return None
+
+    stamp = chart_stamp(currency_pair, period)
+    if list(stamp) == state["stamp"]:
+        raise PreventUpdate
+    if stamp[0] != state["stamp"][0]:
+        return None  # replay wrapped around, the candles were rebuilt
+
+    # Start one candle early so that lines get their previous live point
+    candles = state["candles"]
+    start = max(candles - 1, 0)
+    placements, rows = chart_placements(type_trace, studies)
+    traces = chart_traces_from(currency_pair, period, stamp, placements, start)
+
+    update = {key: [] for key in STREAM_KEYS}
+    max_points = {key: [] for key in STREAM_KEYS}
+    added = 0
+    for row, trace in traces:
+        history, live = split_trace(trace, candles - start)
+        for key in STREAM_KEYS:
+            update[key] += [history[key], live[key]]
+            max_points[key] += [None, live_points(trace)]
+        added = len(history["x"])
+
+    state = dict(state, stamp=list(stamp), candles=candles + added)
+    return [update, list(range(2 * len(traces))), max_points], state
 
 
 # returns chart div
@@ -674,6 +829,8 @@ def chart_div(pair):
                     config={"displayModeBar": False, "scrollZoom": True},
                 )
             ),
+            # what the graph contains, to send only the missing candles
+            dcc.Store(id=pair + "chart_state"),
         ],
     )
 
@@ -775,143 +932,167 @@ def modal(pair):
     )
 
 
-# Dash App Layout
-app.layout = html.Div(
-    className="row",
-    children=[
-        # Interval component for live clock
-        dcc.Interval(id="interval", interval=1 * 1000, n_intervals=0),
-        # Interval component for ask bid updates
-        dcc.Interval(id="i_bis", interval=1 * 2000, n_intervals=0),
-        # Interval component for graph updates
-        dcc.Interval(id="i_tris", interval=1 * 5000, n_intervals=0),
-        # Interval component for graph updates
-        dcc.Interval(id="i_news", interval=1 * 60000, n_intervals=0),
-        # Left Panel Div
-        html.Div(
-            className="three columns div-left-panel",
-            children=[
-                # Div for Left Panel App Info
-                html.Div(
-                    className="div-info",
-                    children=[
-                        html.Img(
-                            className="logo", src=app.get_asset_url("dash-logo.png")
-                        ),
-                        html.H6(className="title-header", children="FOREX TRADER"),
-                        html.P(
-                            """
+# Dash App Layout, served per page load so that each session gets its own id
+def serve_layout():
+    return html.Div(
+        className="row",
+        children=[
+            # Hidden div that stores the id of the session's order book
+            html.Div(str(uuid.uuid4()), id="session_id", style={"display": "none"}),
+            # Hidden buttons clicked by assets/stream.js on server-sent events:
+            # ticks render the rows in the browser and mark the open orders,
+            # candle events only refresh the charts of their pair
+            html.Button(id="tick_event", n_clicks=0, style={"display": "none"}),
+            html.Button(id="mark_event", n_clicks=0, style={"display": "none"}),
+            html.Button(id="news_event", n_clicks=0, style={"display": "none"}),
+            html.Button(id="clock_event", n_clicks=0, style={"display": "none"}),
+            html.Div(
+                [
+                    html.Button(id=pair + "candle_event", n_clicks=0)
+                    for pair in currencies
+                ],
+                style={"display": "none"},
+            ),
+            # Left Panel Div
+            html.Div(
+                className="three columns div-left-panel",
+                children=[
+                    # Div for Left Panel App Info
+                    html.Div(
+                        className="div-info",
+                        children=[
+                            html.Img(
+                                className="logo", src=app.get_asset_url("dash-logo.png")
+                            ),
+                            html.H6(className="title-header", children="FOREX TRADER"),
+                            html.P(
+                                """
                             This app continually queries csv files and updates Ask and Bid prices 
                             for major currency pairs as well as Stock Charts. You can also virtually 
                             buy and sell stocks and see the profit updates.
                             """
-                        ),
-                    ],
-                ),
-                # Ask Bid Currency Div
-                html.Div(
-                    className="div-currency-toggles",
-                    children=[
-                        html.P(
-                            id="live_clock",
-                            className="three-col",
-                            children=datetime.datetime.now().strftime("%H:%M:%S"),
-                        ),
-                        html.P(className="three-col", children="Bid"),
-                        html.P(className="three-col", children="Ask"),
-                        html.Div(
-                            id="pairs",
-                            className="div-bid-ask",
-                            children=[
-                                get_row(first_ask_bid(pair, datetime.datetime.now()))
-                                for pair in currencies
-                            ],
-                        ),
-                    ],
-                ),
-                # Div for News Headlines
-                html.Div(
-                    className="div-news",
-                    children=[html.Div(id="news", children=update_news())],
-                ),
-            ],
-        ),
-        # Right Panel Div
-        html.Div(
-            className="nine columns div-right-panel",
-            children=[
-                # Top Bar Div - Displays Balance, Equity, ... , Open P/L
-                html.Div(
-                    id="top_bar", className="row div-top-bar", children=get_top_bar()
-                ),
-                # Charts Div
-                html.Div(
-                    id="charts",
-                    className="row",
-                    children=[chart_div(pair) for pair in currencies],
-                ),
-                # Panel for orders
-                html.Div(
-                    id="bottom_panel",
-                    className="row div-bottom-panel",
-                    children=[
-                        html.Div(
-                            className="display-inlineblock",
-                            children=[
-                                dcc.Dropdown(
-                                    id="dropdown_positions",
-                                    className="bottom-dropdown",
-                                    options=[
-                                        {"label": "Open Positions", "value": "open"},
-                                        {
-                                            "label": "Closed Positions",
-                                            "value": "closed",
-                                        },
-                                    ],
-                                    value="open",
-                                    clearable=False,
-                                    style={"border": "0px solid black"},
-                                )
-                            ],
-                        ),
-                        html.Div(
-                            className="display-inlineblock float-right",
-                            children=[
-                                dcc.Dropdown(
-                                    id="closable_orders",
-                                    className="bottom-dropdown",
-                                    placeholder="Close order",
-                                )
-                            ],
-                        ),
-                        html.Div(id="orders_table", className="row table-orders"),
-                    ],
-                ),
-            ],
-        ),
-        # Hidden div that stores all clicked charts (EURUSD, USDCHF, etc.)
-        html.Div(id="charts_clicked", style={"display": "none"}),
-        # Hidden div for each pair that stores orders
-        html.Div(
-            children=[
-                html.Div(id=pair + "orders", style={"display": "none"})
-                for pair in currencies
-            ]
-        ),
-        html.Div([modal(pair) for pair in currencies]),
-        # Hidden Div that stores all orders
-        html.Div(id="orders", style={"display": "none"}),
-    ],
-)
+                            ),
+                        ],
+                    ),
+                    # Ask Bid Currency Div
+                    html.Div(
+                        className="div-currency-toggles",
+                        children=[
+                            html.P(
+                                id="live_clock",
+                                className="three-col",
+                                children=replay_clock.now().strftime("%H:%M:%S"),
+                            ),
+                            html.P(className="three-col", children="Bid"),
+                            html.P(className="three-col", children="Ask"),
+                            html.Div(
+                                id="pairs",
+                                className="div-bid-ask",
+                                children=[
+                                    get_row(first_ask_bid(pair, replay_clock.now()))
+                                    for pair in currencies
+                                ],
+                            ),
+                        ],
+                    ),
+                    # Div for News Headlines
+                    html.Div(
+                        className="div-news",
+                        children=[html.Div(id="news", children=update_news())],
+                    ),
+                ],
+            ),
+            # Right Panel Div
+            html.Div(
+                className="nine columns div-right-panel",
+                children=[
+                    # Top Bar Div - Displays Balance, Equity, ... , Open P/L
+                    html.Div(
+                        id="top_bar",
+                        className="row div-top-bar",
+                        children=get_top_bar(),
+                    ),
+                    # Charts Div
+                    html.Div(
+                        id="charts",
+                        className="row",
+                        children=[chart_div(pair) for pair in currencies],
+                    ),
+                    # Panel for orders
+                    html.Div(
+                        id="bottom_panel",
+                        className="row div-bottom-panel",
+                        children=[
+                            html.Div(
+                                className="display-inlineblock",
+                                children=[
+                                    dcc.Dropdown(
+                                        id="dropdown_positions",
+                                        className="bottom-dropdown",
+                                        options=[
+                                            {
+                                                "label": "Open Positions",
+                                                "value": "open",
+                                            },
+                                            {
+                                                "label": "Closed Positions",
+                                                "value": "closed",
+                                            },
+                                        ],
+                                        value="open",
+                                        clearable=False,
+                                        style={"border": "0px solid black"},
+                                    )
+                                ],
+                            ),
+                            html.Div(
+                                className="display-inlineblock float-right",
+                                children=[
+                                    dcc.Dropdown(
+                                        id="closable_orders",
+                                        className="bottom-dropdown",
+                                        placeholder="Close order",
+                                    )
+                                ],
+                            ),
+                            html.Div(id="orders_table", className="row table-orders"),
+                        ],
+                    ),
+                ],
+            ),
+            # Hidden div that stores all clicked charts (EURUSD, USDCHF, etc.)
+            html.Div(id="charts_clicked", style={"display": "none"}),
+            # Hidden div for each pair that stores its last order id
+            html.Div(
+                children=[
+                    html.Div(id=pair + "orders", style={"display": "none"})
+                    for pair in currencies
+                ]
+            ),
+            html.Div([modal(pair) for pair in currencies]),
+            # Hidden Div that stores the orders changed since the previous update
+            html.Div(id="orders", style={"display": "none"}),
+            # Browser copy of all the session's orders
+            dcc.Store(id="orders_store"),
+        ],
+    )
+
+
+app.layout = serve_layout
 
 # Dynamic Callbacks
 
-# Replace currency pair row
-def generate_ask_bid_row_callback(pair):
-    def output_callback(n, i, bid, ask):
-        return replace_row(pair, int(i), float(bid), float(ask))
+# Index of the last tick of a pair at the shared replay time
+def replay_index(currency_pair, t=None):
+    t = replay_clock.now_ns() if t is None else t
+    return max(tick_indexes[currency_pair].at_or_before(t), 0)
+
 
-    return output_callback
+# Bids and asks of all the pairs at the shared replay time
+def current_quotes():
+    t = replay_clock.now_ns()
+    rows = [tick_data[pair].row(replay_index(pair, t)) for pair in currencies]
+    return [row[1] for row in rows], [row[2] for row in rows]
 
 
 # returns string containing clicked charts
@@ -930,22 +1111,21 @@ def generate_chart_button_callback():
     return chart_button_callback
 
 
-# Function to update Graph Figure
+# Function to update Graph Figure, only the candles the browser is missing
+# are sent unless the style, period or studies changed
 def generate_figure_callback(pair):
-    def chart_fig_callback(n_i, p, t, s, pairs, a, b, old_fig):
+    def chart_fig_callback(n_i, p, t, s, pairs, state):
 
-        if pairs is None:
-            return {"layout": {}, "data": {}}
+        if pairs is None or pair not in pairs.split(","):
+            raise PreventUpdate  # hidden charts keep their figure and state
 
-        pairs = pairs.split(",")
-        if pair not in pairs:
-            return {"layout": {}, "data": []}
+        delta = get_fig_delta(pair, t, s, p, state)
+        if delta is None:
+            fig, state = get_fig(pair, t, s, p)
+            return fig, no_update, state
 
-        if old_fig is None or old_fig == {"layout": {}, "data": {}}:
-            return get_fig(pair, a, b, t, s, p)
-
-        fig = get_fig(pair, a, b, t, s, p)
-        return fig
+        extend_data, state = delta
+        return no_update, extend_data, state
 
     return chart_fig_callback
 
@@ -1041,133 +1221,49 @@ def generate_clean_tp_callback():
     return clean_tp
 
 
-# Function to create figure for Buy/Sell Modal
+# Function to create figure for Buy/Sell Modal, at the replay time it is opened
 def generate_modal_figure_callback(pair):
-    def figure_modal(index, n, old_fig):
-        if (n == 0 and old_fig is None) or n == 1:
-            return get_modal_fig(pair, index)
-        return old_fig  # avoid to compute new figure when the modal is hidden
+    def figure_modal(n):
+        if n != 1:
+            raise PreventUpdate  # the modal is hidden
+        return get_modal_fig(pair, replay_index(pair))
 
     return figure_modal
 
 
-# Function updates the pair orders div
+# Function adds the order to the session's order book and stores its id
 def generate_order_button_callback(pair):
-    def order_callback(n, vol, type_order, sl, tp, pair_orders, ask, bid):
+    def order_callback(n, vol, type_order, sl, tp, session_id):
         if n > 0:
-            t = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            l = [] if pair_orders is None else json.loads(pair_orders)
-            price = bid if type_order == "sell" else ask
-
-            if tp != 0:
-                tp = (
-                    price + tp * 0.001
-                    if tp != 0 and pair[3:] == "JPY"
-                    else price + tp * 0.00001
-                )
-
-            if sl != 0:
-                sl = price - sl * 0.001 if pair[3:] == "JPY" else price + sl * 0.00001
-
-            order = {
-                "id": pair + str(len(l)),
-                "time": t,
-                "type": type_order,
-                "volume": vol,
-                "symbol": pair,
-                "tp": tp,
-                "sl": sl,
-                "price": price,
-                "profit": 0.00,
-                "status": "open",
-            }
-            l.append(order)
+            _, bid, ask = tick_data[pair].row(replay_index(pair))
+            price = float(bid if type_order == "sell" else ask)
+            sl, tp = trigger_levels(pair, type_order, price, sl, tp)
 
-            return json.dumps(l)
+            with order_store.session(session_id) as book:
+                order = book.add(pair, type_order, vol, price, sl, tp)
+            return order["id"]
 
-        return json.dumps([])
+        return None
 
     return order_callback
 
 
-# Function to update orders
-def update_orders(orders, current_bids, current_asks, id_to_close):
-    for order in orders:
-        if order["status"] == "open":
-            type_order = order["type"]
-            current_bid = current_bids[currencies.index(order["symbol"])]
-            current_ask = current_asks[currencies.index(order["symbol"])]
-
-            profit = (
-                order["volume"]
-                * 100000
-                * ((current_bid - order["price"]) / order["price"])
-                if type_order == "buy"
-                else (
-                    order["volume"]
-                    * 100000
-                    * ((order["price"] - current_ask) / order["price"])
-                )
-            )
-
-            order["profit"] = "%.2f" % profit
-            price = current_bid if order["type"] == "buy" else current_ask
-
-            if order["id"] == id_to_close:
-                order["status"] = "closed"
-                order["close Time"] = datetime.datetime.now().strftime(
-                    "%Y-%m-%d %H:%M:%S"
-                )
-                order["close Price"] = price
-
-            if order["tp"] != 0 and price >= order["tp"]:
-                order["status"] = "closed"
-                order["close Time"] = datetime.datetime.now().strftime(
-                    "%Y-%m-%d %H:%M:%S"
-                )
-                order["close Price"] = price
-
-            if order["sl"] != 0 and order["sl"] >= price:
-                order["status"] = "closed"
-                order["close Time"] = datetime.datetime.now().strftime(
-                    "%Y-%m-%d %H:%M:%S"
-                )
-                order["close Price"] = price
-    return orders
-
-
-# Function to update orders div
+# Function to update orders div with the orders changed since the client's revision
 def generate_update_orders_div_callback():
     def update_orders_callback(*args):
-        orders = []
-        current_orders = args[-1]
-        close_id = args[-2]
-        args = args[:-2]  # contains list of orders for each pair + asks + bids
-        len_args = len(args)
-        current_bids = args[len_args // 3 : 2 * len_args]
-        current_asks = args[2 * len_args // 3 : len_args]
-        args = args[: len_args // 3]
-        ids = []
-
-        if current_orders is not None:
-            orders = json.loads(current_orders)
-            for order in orders:
-                ids.append(
-                    order["id"]  # ids that allready have been added to current orders
-                )
-
-        for list_order in args:  # each currency pair has its list of orders
-            if list_order != "[]":
-                list_order = json.loads(list_order)
-                for order in list_order:
-                    if order["id"] not in ids:  # only add new orders
-                        orders.append(order)
-        if len(orders) == 0:
-            return None
-
-        # we update status and profit of orders
-        orders = update_orders(orders, current_bids, current_asks, close_id)
-        return json.dumps(orders)
+        close_id, last_delta, session_id = args[-3:]
+        current_bids, current_asks = current_quotes()
+
+        since = json.loads(last_delta)["revision"] if last_delta else None
+        with order_store.session(session_id) as book:
+            empty = not len(book)
+            if not empty:
+                # we update status and profit of orders
+                book.update(current_bids, current_asks, close_id)
+                revision, reset, changed = book.changes(since)
+        if empty or (not reset and not changed):
+            raise PreventUpdate
+        return json.dumps({"revision": revision, "reset": reset, "orders": changed})
 
     return update_orders_callback
 
@@ -1221,32 +1317,21 @@ for pair in currencies:
 
     # Callback to update the actual graph
     app.callback(
-        Output(pair + "chart", "figure"),
         [
-            Input("i_tris", "n_intervals"),
+            Output(pair + "chart", "figure"),
+            Output(pair + "chart", "extendData"),
+            Output(pair + "chart_state", "data"),
+        ],
+        [
+            Input(pair + "candle_event", "n_clicks"),
             Input(pair + "dropdown_period", "value"),
             Input(pair + "chart_type", "value"),
             Input(pair + "studies", "value"),
             Input("charts_clicked", "children"),
         ],
-        [
-            State(pair + "ask", "children"),
-            State(pair + "bid", "children"),
-            State(pair + "chart", "figure"),
-        ],
+        [State(pair + "chart_state", "data")],
     )(generate_figure_callback(pair))
 
-    # updates the ask and bid prices
-    app.callback(
-        Output(pair + "row", "children"),
-        [Input("i_bis", "n_intervals")],
-        [
-            State(pair + "index", "children"),
-            State(pair + "bid", "children"),
-            State(pair + "ask", "children"),
-        ],
-    )(generate_ask_bid_row_callback(pair))
-
     # close graph by setting to 0 n_clicks property
     app.callback(
         Output(pair + "Button_chart", "n_clicks"),
@@ -1310,12 +1395,10 @@ for pair in currencies:
 
     # updates modal figure
     app.callback(
-        Output(pair + "modal_graph", "figure"),
-        [Input(pair + "index", "children"), Input(pair + "Buy", "n_clicks")],
-        [State(pair + "modal_graph", "figure")],
+        Output(pair + "modal_graph", "figure"), [Input(pair + "Buy", "n_clicks")]
     )(generate_modal_figure_callback(pair))
 
-    # each pair saves its orders in hidden div
+    # each pair saves the id of its last order in hidden div
     app.callback(
         Output(pair + "orders", "children"),
         [Input(pair + "button_order", "n_clicks")],
@@ -1324,12 +1407,18 @@ for pair in currencies:
             State(pair + "trade_type", "value"),
             State(pair + "SL", "value"),
             State(pair + "TP", "value"),
-            State(pair + "orders", "children"),
-            State(pair + "ask", "children"),
-            State(pair + "bid", "children"),
+            State("session_id", "children"),
         ],
     )(generate_order_button_callback(pair))
 
+    # renders the ask and bid prices in the browser from the last tick event
+    app.clientside_callback(
+        ClientsideFunction(namespace="quotes", function_name="row"),
+        Output(pair + "row", "children"),
+        [Input("tick_event", "n_clicks")],
+        [State(pair, "children"), State(pair + "row", "children")],
+    )
+
 # updates hidden div with all the clicked charts
 app.callback(
     Output("charts_clicked", "children"),
@@ -1337,114 +1426,82 @@ app.callback(
     [State("charts_clicked", "children")],
 )(generate_chart_button_callback())
 
-# updates hidden orders div with all pairs orders
+# updates hidden orders div with the orders changed since last update
 app.callback(
     Output("orders", "children"),
     [Input(pair + "orders", "children") for pair in currencies]
-    + [Input(pair + "bid", "children") for pair in currencies]
-    + [Input(pair + "ask", "children") for pair in currencies]
-    + [Input("closable_orders", "value")],
-    [State("orders", "children")],
+    + [Input("mark_event", "n_clicks"), Input("closable_orders", "value")],
+    [State("orders", "children"), State("session_id", "children")],
 )(generate_update_orders_div_callback())
 
-# Callback to update Orders Table
-@app.callback(
-    Output("orders_table", "children"),
-    [Input("orders", "children"), Input("dropdown_positions", "value")],
+# Live clock shows the replay time of the last clock event, in the browser
+app.clientside_callback(
+    ClientsideFunction(namespace="clock", function_name="show"),
+    Output("live_clock", "children"),
+    [Input("clock_event", "n_clicks")],
+    [State("live_clock", "children")],
 )
-def update_order_table(orders, position):
-    headers = [
-        "Order Id",
-        "Time",
-        "Type",
-        "Volume",
-        "Symbol",
-        "TP",
-        "SL",
-        "Price",
-        "Profit",
-        "Status",
-        "Close Time",
-        "Close Price",
-    ]
-
-    # If there are no orders
-    if orders is None or orders is "[]":
-        return [
-            html.Table(html.Tr(children=[html.Th(title) for title in headers])),
-            html.Div(
-                className="text-center table-orders-empty",
-                children=[html.P("No " + position + " positions data row")],
-            ),
-        ]
-
-    rows = []
-    list_order = json.loads(orders)
-    for order in list_order:
-        tr_childs = []
-        for attr in order:
-            if str(order["status"]) == position:
-                tr_childs.append(html.Td(order[attr]))
-        # Color row based on profitability of order
-        if float(order["profit"]) >= 0:
-            rows.append(html.Tr(className="profit", children=tr_childs))
-        else:
-            rows.append(html.Tr(className="no-profit", children=tr_childs))
 
-    return html.Table(children=[html.Tr([html.Th(title) for title in headers])] + rows)
+# merges the changed orders into the browser's copy of the orders
+app.clientside_callback(
+    ClientsideFunction(namespace="orders", function_name="merge"),
+    Output("orders_store", "data"),
+    [Input("orders", "children")],
+    [State("orders_store", "data")],
+)
 
+# Orders Table is rendered in the browser from its copy of the orders
+app.clientside_callback(
+    ClientsideFunction(namespace="orders", function_name="table"),
+    Output("orders_table", "children"),
+    [Input("orders_store", "data"), Input("dropdown_positions", "value")],
+)
 
 # Update Options in dropdown for Open and Close positions
-@app.callback(Output("dropdown_positions", "options"), [Input("orders", "children")])
-def update_positions_dropdown(orders):
-    closeOrders = 0
-    openOrders = 0
-    if orders is not None:
-        orders = json.loads(orders)
-        for order in orders:
-            if order["status"] == "closed":
-                closeOrders += 1
-            if order["status"] == "open":
-                openOrders += 1
+@app.callback(
+    Output("dropdown_positions", "options"),
+    [Input("orders", "children")],
+    [State("session_id", "children")],
+)
+def update_positions_dropdown(orders, session_id):
+    with order_store.session(session_id) as book:
+        summary = book.summary()
     return [
-        {"label": "Open positions (" + str(openOrders) + ")", "value": "open"},
-        {"label": "Closed positions (" + str(closeOrders) + ")", "value": "closed"},
+        {"label": "Open positions (" + str(summary["open"]) + ")", "value": "open"},
+        {
+            "label": "Closed positions (" + str(summary["closed"]) + ")",
+            "value": "closed",
+        },
     ]
 
 
 # Callback to close orders from dropdown options
-@app.callback(Output("closable_orders", "options"), [Input("orders", "children")])
-def update_close_dropdown(orders):
-    options = []
-    if orders is not None:
-        orders = json.loads(orders)
-        for order in orders:
-            if order["status"] == "open":
-                options.append({"label": order["id"], "value": order["id"]})
-    return options
+@app.callback(
+    Output("closable_orders", "options"),
+    [Input("orders", "children")],
+    [State("session_id", "children")],
+)
+def update_close_dropdown(orders, session_id):
+    with order_store.session(session_id) as book:
+        open_ids = book.open_ids()
+    return [{"label": order_id, "value": order_id} for order_id in open_ids]
 
 
 # Callback to update Top Bar values
-@app.callback(Output("top_bar", "children"), [Input("orders", "children")])
-def update_top_bar(orders):
-    if orders is None or orders is "[]":
+@app.callback(
+    Output("top_bar", "children"),
+    [Input("orders", "children")],
+    [State("session_id", "children")],
+)
+def update_top_bar(orders, session_id):
+    with order_store.session(session_id) as book:
+        summary = book.summary() if len(book) else None
+    if summary is None:
         return get_top_bar()
 
-    orders = json.loads(orders)
-    open_pl = 0
-    balance = 50000
-    free_margin = 50000
-    margin = 0
-
-    for order in orders:
-        if order["status"] == "open":
-            open_pl += float(order["profit"])
-            conversion_price = (
-                1 if order["symbol"][:3] == "USD" else float(order["price"])
-            )
-            margin += (float(order["volume"]) * 100000) / (200 * conversion_price)
-        else:
-            balance += float(order["profit"])
+    open_pl = summary["open_pl"]
+    balance = 50000 + summary["realized"]
+    margin = summary["margin"]
 
     equity = balance - open_pl
     free_margin = equity - margin
@@ -1458,14 +1515,8 @@ def update_top_bar(orders):
     return get_top_bar(balance, equity, margin, free_margin, margin_level, open_pl)
 
 
-# Callback to update live clock
-@app.callback(Output("live_clock", "children"), [Input("interval", "n_intervals")])
-def update_time(n):
-    return datetime.datetime.now().strftime("%H:%M:%S")
-
-
 # Callback to update news
-@app.callback(Output("news", "children"), [Input("i_news", "n_intervals")])
+@app.callback(Output("news", "children"), [Input("news_event", "n_clicks")])
 def update_news_div(n):
     return update_news()
 
@@ -0,0 +1,102 @@
+if (!window.dash_clientside) {
+  window.dash_clientside = {};
+}
+
+// Columns of the orders table and the order keys they display
+var ORDER_COLUMNS = [
+  ["Order Id", "id"],
+  ["Time", "time"],
+  ["Type", "type"],
+  ["Volume", "volume"],
+  ["Symbol", "symbol"],
+  ["TP", "tp"],
+  ["SL", "sl"],
+  ["Price", "price"],
+  ["Profit", "profit"],
+  ["Status", "status"],
+  ["Close Time", "close Time"],
+  ["Close Price", "close Price"]
+];
+
+// Whether the browser copy holds open orders, the ticks only ask the server
+// to mark the orders to market while it does
+var hasOpenOrders = false;
+
+function htmlComponent(type, props) {
+  return { type: type, namespace: "dash_html_components", props: props };
+}
+
+window.dash_clientside.orders = {
+  // Merge the orders changed since the last update into the browser copy
+  merge: function(delta, store) {
+    if (!delta) {
+      return store || { ids: [], orders: {} };
+    }
+    delta = JSON.parse(delta);
+    var merged =
+      store && !delta.reset
+        ? { ids: store.ids.slice(), orders: Object.assign({}, store.orders) }
+        : { ids: [], orders: {} };
+    delta.orders.forEach(function(order) {
+      if (!(order.id in merged.orders)) {
+        merged.ids.push(order.id);
+      }
+      merged.orders[order.id] = order;
+    });
+    merged.revision = delta.revision;
+    hasOpenOrders = merged.ids.some(function(id) {
+      return merged.orders[id].status === "open";
+    });
+    return merged;
+  },
+
+  hasOpen: function() {
+    return hasOpenOrders;
+  },
+
+  // Render the orders table for open or closed positions
+  table: function(store, position) {
+    var header = htmlComponent("Tr", {
+      children: ORDER_COLUMNS.map(function(column) {
+        return htmlComponent("Th", { children: column[0] });
+      })
+    });
+    var orders = store
+      ? store.ids
+          .map(function(id) {
+            return store.orders[id];
+          })
+          .filter(function(order) {
+            return order.status === position;
+          })
+      : [];
+
+    if (!orders.length) {
+      return [
+        htmlComponent("Table", { children: header }),
+        htmlComponent("Div", {
+          className: "text-center table-orders-empty",
+          children: [
+            htmlComponent("P", {
+              children: "No " + position + " positions data row"
+            })
+          ]
+        })
+      ];
+    }
+
+    var rows = orders.map(function(order) {
+      return htmlComponent("Tr", {
+        // Color row based on profitability of order
+        className: parseFloat(order.profit) >= 0 ? "profit" : "no-profit",
+        children: ORDER_COLUMNS.map(function(column) {
+          var value = order[column[1]];
+          return htmlComponent("Td", {
+            children: value === undefined ? "" : String(value)
+          });
+        })
+      });
+    });
+    return htmlComponent("Table", { children: [header].concat(rows) });
+  }
+};
@@ -0,0 +1,93 @@
+// Subscribe to the server-sent events of the app. The bid and ask rows and
+// the live clock are rendered in the browser from the last events, while
+// candle events and ticks moving open orders click the hidden buttons their
+// server callbacks listen to, so the server is only called when a shown chart
+// or an open order changed.
+(function() {
+  if (!window.dash_clientside) {
+    window.dash_clientside = {};
+  }
+
+  // Payload of the last event of each kind
+  var last = {};
+
+  function htmlP(id, children, color) {
+    var props = { id: id, className: "three-col", children: children };
+    if (color) {
+      props.style = { color: color };
+    }
+    return { type: "P", namespace: "dash_html_components", props: props };
+  }
+
+  window.dash_clientside.clock = {
+    // Text of the live clock, unchanged until the first clock event
+    show: function(n_clicks, children) {
+      return "clock" in last ? last.clock : children;
+    }
+  };
+
+  window.dash_clientside.quotes = {
+    // Bid and ask row of a pair, unchanged until the first tick event
+    row: function(n_clicks, pair, children) {
+      var quote = last.tick && last.tick[pair];
+      if (!quote) {
+        return children;
+      }
+      return [
+        htmlP(pair, pair),
+        htmlP(pair + "bid", quote.bid, quote.bid_color),
+        htmlP(pair + "ask", quote.ask, quote.ask_color)
+      ];
+    }
+  };
+
+  if (!window.EventSource) {
+    return;
+  }
+
+  // Hidden buttons clicked by each event, given its payload and the previous one
+  var EVENT_BUTTONS = {
+    clock: function() {
+      return ["clock_event"];
+    },
+    tick: function() {
+      var orders = window.dash_clientside.orders;
+      if (orders && orders.hasOpen()) {
+        return ["tick_event", "mark_event"];
+      }
+      return ["tick_event"];
+    },
+    candle: function(data, previous) {
+      return Object.keys(data)
+        .filter(function(pair) {
+          return (
+            !previous ||
+            JSON.stringify(data[pair]) !== JSON.stringify(previous[pair])
+          );
+        })
+        .map(function(pair) {
+          return pair + "candle_event";
+        });
+    },
+    news: function() {
+      return ["news_event"];
+    }
+  };
+
+  // The stream is served under the prefix of the Dash requests
+  var config = JSON.parse(document.getElementById("_dash-config").textContent);
+  var source = new EventSource(config.requests_pathname_prefix + "stream");
+
+  Object.keys(EVENT_BUTTONS).forEach(function(event) {
+    source.addEventListener(event, function(e) {
+      var previous = last[event];
+      last[event] = JSON.parse(e.data);
+      EVENT_BUTTONS[event](last[event], previous).forEach(function(id) {
+        var button = document.getElementById(id);
+        if (button) {
+          button.click();
+        }
+      });
+    });
+  });
+})();
@@ -0,0 +1,134 @@
+import argparse
+import collections
+import pathlib
+import time
+
+import numpy as np
+
+from trader.orders import LOT_SIZE, trigger_levels
+from trader.store import TickStore
+from trader.triggers import TriggerBook
+
+
+RestingOrder = collections.namedtuple(
+    "RestingOrder", "id, symbol, side, volume, price, sl, tp"
+)
+
+Fill = collections.namedtuple("Fill", "time, id, symbol, kind, price, profit")
+
+
+def replay(ticks, orders):
+    """
+    Replay the tick history of every pair through a TriggerBook
+
+    :params ticks: dict of pair -> PairTicks
+    :params orders: iterable of RestingOrder, resting before the first tick
+    :returns: list of Fill in time order
+    """
+
+    book = TriggerBook()
+    by_id = {}
+    for order in orders:
+        book.add(order.id, order.symbol, order.side, order.sl, order.tp)
+        by_id[order.id] = order
+
+    # merge the ticks of all pairs in time order
+    pairs = list(ticks)
+    times = np.concatenate([ticks[pair].time for pair in pairs])
+    codes = np.concatenate(
+        [
+            np.full(len(ticks[pair]), code, dtype=np.int16)
+            for code, pair in enumerate(pairs)
+        ]
+    )
+    rows = np.concatenate([np.arange(len(ticks[pair])) for pair in pairs])
+    order = np.argsort(times, kind="mergesort")
+
+    fills = []
+    for i in order:
+        pair = pairs[codes[i]]
+        row = rows[i]
+        bid = float(ticks[pair].bid[row])
+        ask = float(ticks[pair].ask[row])
+        for order_id, kind in book.fire(pair, bid, ask):
+            resting = by_id[order_id]
+            side = 1 if resting.side == "buy" else -1
+            price = bid if side > 0 else ask
+            profit = (
+                resting.volume
+                * LOT_SIZE
+                * side
+                * (price - resting.price)
+                / resting.price
+            )
+            fills.append(Fill(int(times[i]), order_id, pair, kind, price, profit))
+        if not len(book):
+            break
+    return fills
+
+
+def random_orders(ticks, count, max_points=500, seed=0):
+    """
+    Resting orders opened at the first tick of each pair
+
+    :params ticks: dict of pair -> PairTicks
+    :params count: number of orders
+    :params max_points: largest SL and TP distance, in points
+    :params seed: random seed
+    :returns: list of RestingOrder
+    """
+
+    rng = np.random.RandomState(seed)
+    pairs = list(ticks)
+    symbols = rng.randint(len(pairs), size=count)
+    sides = rng.randint(2, size=count)
+    distances = rng.randint(1, max_points, size=(count, 2))
+    orders = []
+    for i in range(count):
+        pair = pairs[symbols[i]]
+        side = "buy" if sides[i] else "sell"
+        price = float(ticks[pair].ask[0] if side == "buy" else ticks[pair].bid[0])
+        sl, tp = trigger_levels(pair, side, price, distances[i, 0], distances[i, 1])
+        orders.append(RestingOrder(i, pair, side, 0.1, price, sl, tp))
+    return orders
+
+
+def report(fills, orders, elapsed):
+    """
+    :returns: dict summarizing the fills of a replay
+    """
+
+    kinds = collections.Counter(fill.kind for fill in fills)
+    return {
+        "orders": len(orders),
+        "fills": len(fills),
+        "take_profit": kinds["tp"],
+        "stop_loss": kinds["sl"],
+        "resting": len(orders) - len(fills),
+        "profit": round(sum(fill.profit for fill in fills), 2),
+        "seconds": round(elapsed, 3),
+    }
+
+
+if __name__ == "__main__":
+    data_path = pathlib.Path(__file__).resolve().parent.parent.joinpath("data")
+    parser = argparse.ArgumentParser(
+        description="Replay the tick history through the SL/TP trigger book."
+    )
+    parser.add_argument("--orders", type=int, default=100000)
+    parser.add_argument("--max-points", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data", default=str(data_path), help="tick CSV directory")
+    parser.add_argument(
+        "--pairs", default="EURUSD,USDCHF,USDJPY,GBPUSD", help="comma separated"
+    )
+    args = parser.parse_args()
+
+    store = TickStore(pathlib.Path(args.data).joinpath("ticks"), csv_path=args.data)
+    ticks = {pair: store.load(pair) for pair in args.pairs.split(",")}
+    orders = random_orders(ticks, args.orders, args.max_points, args.seed)
+
+    start = time.time()
+    fills = replay(ticks, orders)
+    for key, value in report(fills, orders, time.time() - start).items():
+        print("{:>12}: {}".format(key, value))
@@ -0,0 +1,297 @@
+import argparse
+import collections
+import json
+import os
+import pathlib
+import subprocess
+import sys
+import tempfile
+import timeit
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from trader.store import write_columns
+
+
+APP_PATH = pathlib.Path(__file__).resolve().parent.parent
+
+# Days of synthetic ticks of each history size
+SIZES = collections.OrderedDict([("day", 1), ("month", 30), ("year", 365)])
+
+# Starting mid prices of the synthetic pairs
+PRICES = collections.OrderedDict(
+    [("EURUSD", 1.08), ("USDCHF", 1.0), ("USDJPY", 119.0), ("GBPUSD", 1.47)]
+)
+
+FIRST_DAY = pd.Timestamp("2016-01-04")
+
+# Absolute margin added to the tolerance of each metric, so that timer and
+# allocator noise on tiny values is not reported as a regression
+NOISE = {"seconds": 1e-4, "peak_bytes": 64 * 1024}
+
+
+def synthetic_ticks(days, ticks_per_day, price, seed=0):
+    """
+    Random walk ticks spread uniformly over whole days
+
+    :params days: number of days from FIRST_DAY
+    :params ticks_per_day: average number of ticks per day
+    :params price: starting mid price
+    :params seed: random seed
+    :returns: dict of store columns
+    """
+
+    rng = np.random.RandomState(seed)
+    count = days * ticks_per_day
+    span = days * 24 * 3600 * 10 ** 9 - 10 ** 9  # the replay stops 1s before
+    time = FIRST_DAY.value + np.sort(rng.randint(0, span, count))
+    bid = price * np.exp(np.cumsum(rng.normal(0, 1e-5, count)))
+    return {"time": time, "bid": bid, "ask": bid + price * 1e-4}
+
+
+def write_store(data_path, days, ticks_per_day, seed=0):
+    """
+    Write a synthetic tick store for every pair, news file included
+
+    :params data_path: directory used as the app DATA_PATH
+    """
+
+    data_path = pathlib.Path(data_path)
+    for i, (pair, price) in enumerate(PRICES.items()):
+        ticks = synthetic_ticks(days, ticks_per_day, price, seed + i)
+        write_columns(data_path.joinpath("ticks", pair), ticks)
+    with open(str(data_path.joinpath("news.json")), "w") as f:
+        json.dump({"articles": []}, f)
+
+
+def measure(func, repeat=5):
+    """
+    :params func: zero-argument callable
+    :params repeat: timings taken, the best one is kept
+    :returns: dict of seconds per call and peak traced memory in bytes
+    """
+
+    timer = timeit.Timer(func)
+    number = timer.autorange()[0]  # calls per timing, for at least 0.2s
+    seconds = min(timer.repeat(repeat, number)) / number
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"seconds": seconds, "peak_bytes": peak}
+
+
+def app_benchmarks(repeat, order_counts):
+    """
+    Time the hot paths of the app, configured by the environment set by run
+
+    :params repeat: timings taken of each benchmark
+    :params order_counts: numbers of open orders to mark to market
+    :returns: OrderedDict of benchmark name to measure result
+    """
+
+    import app
+    from trader.ohlc import OHLCPyramid, Stamp
+    from trader.orders import OrderBook
+
+    results = collections.OrderedDict()
+    pair = app.currencies[0]
+    period = app.chart_periods[0]
+    ticks = app.tick_data[pair]
+    t = app.replay_clock.now_ns()
+
+    # Candles of the whole history at every period, from scratch
+    results["ohlc_fold"] = measure(
+        lambda: OHLCPyramid(
+            app.tick_indexes[pair], ticks.bid, app.chart_periods
+        ).advance(t),
+        repeat,
+    )
+
+    # Every chart style and study over the candles of the shortest period
+    app.ohlc_pyramids[pair].advance(t)
+    frame = app.ohlc_pyramids[pair].frame(period)
+    for builder in app.chart_traces:
+        results["trace." + builder.name] = measure(
+            lambda: builder.func(frame, **dict(builder.params)), repeat
+        )
+
+    # Whole figure with no, some and all the studies, traces not cached
+    studies = [builder.name for builder in app.chart_traces if builder.row != "main"]
+    for selected in ([], studies[:3], studies):
+
+        def get_fig():
+            app.chart_traces.cache.clear()
+            app.trace_frames.clear()
+            return app.get_fig(pair, "candlestick_trace", selected, period)
+
+        results["get_fig[{} studies]".format(len(selected))] = measure(get_fig, repeat)
+
+    # Refresh of a figure missing its last closed candle, as stamped when the
+    # candle before it was still forming
+    _, state = app.get_fig(pair, "candlestick_trace", studies, period)
+    times = app.ohlc_pyramids[pair].frame(period).index.values.view(np.int64)
+    stale = Stamp(*state["stamp"])._replace(
+        cursor=0, candles=len(times) - 1, closed=int(times[-3]), last=int(times[-2])
+    )
+    state = dict(state, stamp=list(stale), candles=state["candles"] - 1)
+
+    def get_fig_delta():
+        app.chart_traces.cache.clear()
+        app.trace_frames.clear()
+        return app.get_fig_delta(pair, "candlestick_trace", studies, period, state)
+
+    results["get_fig_delta[{} studies]".format(len(studies))] = measure(
+        get_fig_delta, repeat
+    )
+
+    results["quote"] = measure(lambda: app.quote(pair, len(ticks) - 1), repeat)
+
+    # Marking open orders to market on alternating prices, so every profit changes
+    rng = np.random.RandomState(0)
+    last = [app.tick_data[symbol].row(-1) for symbol in app.currencies]
+    quotes = [
+        ([row[1] * shift for row in last], [row[2] * shift for row in last])
+        for shift in (1.0, 1.0001)
+    ]
+    for count in order_counts:
+        book = OrderBook(app.currencies)
+        for code in rng.randint(0, len(app.currencies), count):
+            _, bid, ask = last[code]
+            side = "buy" if rng.rand() < 0.5 else "sell"
+            book.add(
+                app.currencies[code], side, 0.1, ask if side == "buy" else bid, 0, 0
+            )
+        client = {"tick": 0, "revision": book.revision}
+
+        def update_orders():
+            bids, asks = quotes[client["tick"] % 2]
+            client["tick"] += 1
+            book.update(bids, asks)
+            client["revision"] = book.changes(client["revision"])[0]
+
+        results["update_orders[{} orders]".format(count)] = measure(
+            update_orders, repeat
+        )
+
+    return results
+
+
+def run(size, ticks_per_day, repeat, order_counts, data_root):
+    """
+    Benchmark one history size in a fresh interpreter importing the app
+
+    :returns: OrderedDict of benchmark name to measure result
+    """
+
+    days = SIZES[size]
+    data_path = pathlib.Path(data_root).joinpath("{}-{}".format(size, ticks_per_day))
+    if not data_path.joinpath("news.json").exists():
+        write_store(data_path, days, ticks_per_day)
+
+    end = FIRST_DAY + pd.Timedelta(days=days)
+    env = dict(
+        os.environ,
+        DATA_PATH=str(data_path),
+        NEWS_FILE=str(data_path.joinpath("news.json")),
+        REPLAY_CLOCK_FILE=str(data_path.joinpath("replay.clock")),
+        REPLAY_FROM=str(FIRST_DAY),
+        REPLAY_TO=str(end),
+        REPLAY_START=str(end - pd.Timedelta(seconds=1)),
+        REPLAY_SPEED="1e-9",  # hold the replay at the end of the history
+    )
+    output = data_path.joinpath("results.json")
+    subprocess.run(
+        [sys.executable, "-m", "trader.bench", "--worker", str(output)]
+        + ["--repeat", str(repeat), "--orders"]
+        + [str(count) for count in order_counts],
+        env=env,
+        cwd=str(APP_PATH),
+        check=True,
+    )
+    with open(str(output)) as f:
+        return json.load(f, object_pairs_hook=collections.OrderedDict)
+
+
+def compare(results, baseline, tolerance):
+    """
+    :params results: dict of size to benchmark results
+    :params baseline: results of a previous run
+    :params tolerance: relative increase allowed, 0.25 for 25%
+    :returns: list of (size, benchmark, metric, baseline value, value)
+    """
+
+    regressions = []
+    for size, benchmarks in results.items():
+        for name, result in benchmarks.items():
+            base = baseline.get(size, {}).get(name)
+            if base is None:
+                continue
+            for metric, noise in NOISE.items():
+                if result[metric] > base[metric] * (1 + tolerance) + noise:
+                    regressions.append(
+                        (size, name, metric, base[metric], result[metric])
+                    )
+    return regressions
+
+
+def print_results(results):
+    for size, benchmarks in results.items():
+        print(size)
+        for name, result in benchmarks.items():
+            print(
+                "{:>40}: {:>10.3f} ms {:>10.1f} KiB".format(
+                    name, result["seconds"] * 1000, result["peak_bytes"] / 1024
+                )
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Time the chart, study and order hot paths on synthetic ticks."
+    )
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=list(SIZES))
+    parser.add_argument("--ticks-per-day", type=int, default=10000)
+    parser.add_argument("--orders", type=int, nargs="+", default=[100, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--data",
+        default=os.path.join(tempfile.gettempdir(), "dash-web-trader-bench"),
+        help="directory of the synthetic tick stores, reused across runs",
+    )
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.5)
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        with open(args.worker, "w") as f:
+            json.dump(app_benchmarks(args.repeat, args.orders), f)
+        sys.exit()
+
+    results = collections.OrderedDict(
+        (size, run(size, args.ticks_per_day, args.repeat, args.orders, args.data))
+        for size in args.sizes
+    )
+    print_results(results)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for size, name, metric, base, value in regressions:
+            print(
+                "REGRESSION {} {} {}: {:.6g} -> {:.6g}".format(
+                    size, name, metric, base, value
+                )
+            )
+        if regressions:
+            sys.exit(1)
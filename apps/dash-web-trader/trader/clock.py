@@ -0,0 +1,176 @@
+import contextlib
+import fcntl
+import mmap
+import os
+import struct
+import time
+
+import pandas as pd
+
+from trader.ticks import to_ns
+
+
+# sequence, anchor wall time, replay time at anchor, range start, range end
+# and speed; the sequence is odd while a writer is updating the fields
+LAYOUT = struct.Struct("<qqqqqd")
+
+DAY = 24 * 3600 * 10 ** 9
+
+# Attempts of a reader at a consistent copy of the fields before it falls back
+READ_ATTEMPTS = 100
+
+
+class ReplayClock:
+    """
+    Replay time shared by every process using the same clock file.
+
+    The replay time advances ``speed`` times faster than the wall clock from
+    ``start``, wrapping around within [range start, range end). All the
+    parameters live in a small memory-mapped file, so gunicorn workers
+    compute the same replay time, and therefore the same tick, without
+    talking to each other.
+    """
+
+    def __init__(self, path, lo, hi, speed=1.0, start=None):
+        """
+        :params path: clock file, created on first use
+        :params lo: datetime-like start of the replayed range, inclusive
+        :params hi: datetime-like end of the replayed range, exclusive
+        :params speed: replay seconds per wall clock second
+        :params start: datetime-like replay time now, by default a running
+            replay with the same range and speed is joined, or a new one
+            starts at the current time of day on the first day
+        """
+
+        self.path = str(path)
+        lo, hi, speed = to_ns(lo), to_ns(hi), float(speed)
+        if hi <= lo:
+            raise ValueError("Empty replay range")
+        if speed <= 0:
+            raise ValueError("Replay speed must be positive")
+        explicit = start is not None
+        if explicit:
+            start = to_ns(start)
+        else:
+            now = pd.Timestamp.now()
+            start = lo + (now - now.floor("D")).value
+
+        self._create((start, lo, hi, speed))
+        with open(self.path, "r+b") as f:
+            self._map = mmap.mmap(f.fileno(), LAYOUT.size)
+        self._fields = None  # last consistent copy of the fields
+
+        # A replay with another configuration left by a previous run restarts
+        with self._locked():
+            _, running, *config = self._read_locked()
+            if config != [lo, hi, speed] or (explicit and start != running):
+                self._write(start, lo, hi, speed)
+
+    def _create(self, config):
+        # link() fails if the file exists, so concurrent workers all end up
+        # mapping the file of the first one
+        tmp = "{}.{}.tmp".format(self.path, os.getpid())
+        with open(tmp, "wb") as f:
+            f.write(LAYOUT.pack(0, time.time_ns(), *config))
+        try:
+            os.link(tmp, self.path)
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(tmp)
+
+    @contextlib.contextmanager
+    def _locked(self):
+        # Writers hold an exclusive lock on the clock file. The file is opened
+        # again on every call, so that the threads of a process exclude each
+        # other too.
+        with open(self.path, "rb") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _read(self):
+        for _ in range(READ_ATTEMPTS):
+            fields = LAYOUT.unpack_from(self._map)
+            if fields[0] % 2 == 0 and LAYOUT.unpack_from(self._map)[0] == fields[0]:
+                self._fields = fields[1:]
+                return self._fields
+            time.sleep(0)  # let the writer, or the other greenlets, run
+        if self._fields is not None:
+            return self._fields
+        with self._locked():
+            return self._read_locked()
+
+    def _read_locked(self):
+        # No writer runs while the lock is held, an odd sequence was left by
+        # one that died during its update
+        fields = LAYOUT.unpack_from(self._map)
+        if fields[0] % 2:
+            struct.pack_into("<q", self._map, 0, fields[0] + 1)
+        self._fields = fields[1:]
+        return self._fields
+
+    def _write(self, start, lo, hi, speed):
+        sequence = LAYOUT.unpack_from(self._map)[0]
+        struct.pack_into("<q", self._map, 0, sequence + 1)
+        LAYOUT.pack_into(
+            self._map, 0, sequence + 1, time.time_ns(), start, lo, hi, speed
+        )
+        struct.pack_into("<q", self._map, 0, sequence + 2)
+
+    def reset(self, start, lo, hi, speed):
+        """
+        Restart the replay at start for every process
+
+        :params start: replay time now, int nanoseconds
+        :params lo: range start, int nanoseconds
+        :params hi: range end, int nanoseconds
+        :params speed: replay seconds per wall clock second
+        """
+
+        with self._locked():
+            self._write(start, lo, hi, speed)
+
+    def now_ns(self):
+        """
+        :returns: replay time, int nanoseconds
+        """
+
+        anchor, start, lo, hi, speed = self._read()
+        elapsed = int((time.time_ns() - anchor) * speed)
+        return lo + (start - lo + elapsed) % (hi - lo)
+
+    def now(self):
+        """
+        :returns: replay time, datetime
+        """
+
+        return pd.Timestamp(self.now_ns()).to_pydatetime(warn=False)
+
+    @classmethod
+    def from_env(cls, path, first, last, environ=os.environ):
+        """
+        Clock over the tick data configured by environment variables
+
+        REPLAY_FROM and REPLAY_TO bound the replayed range, by default the
+        whole days of the ticks. REPLAY_START starts the replay at the given
+        time, otherwise workers join the running replay if any. REPLAY_SPEED
+        is the speed multiplier, 1 by default.
+
+        :params path: clock file
+        :params first: datetime-like of the first tick
+        :params last: datetime-like of the last tick
+        :params environ: mapping of environment variables
+        :returns: ReplayClock
+        """
+
+        lo = pd.Timestamp(environ.get("REPLAY_FROM") or pd.Timestamp(first).floor("D"))
+        hi = pd.Timestamp(
+            environ.get("REPLAY_TO")
+            or pd.Timestamp(last).floor("D") + pd.Timedelta(DAY)
+        )
+        start = environ.get("REPLAY_START") or None
+        speed = float(environ.get("REPLAY_SPEED", 1))
+        return cls(path, lo, hi, speed, start)
@@ -0,0 +1,67 @@
+import numpy as np
+
+
+class Column:
+    """
+    Append-only numpy array with amortized O(1) appends.
+
+    ``values`` is a view on the filled part of the buffer, so readers slice
+    it without copying.
+    """
+
+    def __init__(self, dtype, capacity=256):
+        self._data = np.empty(capacity, dtype=dtype)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def values(self):
+        return self._data[: self._size]
+
+    def append(self, value):
+        if self._size == len(self._data):
+            self._grow(self._size + 1)
+        self._data[self._size] = value
+        self._size += 1
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=self._data.dtype)
+        size = self._size + len(values)
+        if size > len(self._data):
+            self._grow(size)
+        self._data[self._size : size] = values
+        self._size = size
+
+    def with_last(self, value):
+        """
+        View of the values followed by one provisional value that is not kept
+
+        :params value: value shown after the filled part
+        :returns: numpy array view
+        """
+
+        if self._size == len(self._data):
+            self._grow(self._size + 1)
+        self._data[self._size] = value
+        return self._data[: self._size + 1]
+
+    def clear(self):
+        self._size = 0
+
+    def compress(self, keep):
+        """
+        Keep only the values where the boolean mask is True
+
+        :params keep: boolean array as long as the column
+        """
+
+        values = self.values[keep]
+        self._data[: len(values)] = values
+        self._size = len(values)
+
+    def _grow(self, size):
+        data = np.empty(max(size, 2 * len(self._data)), dtype=self._data.dtype)
+        data[: self._size] = self.values
+        self._data = data
@@ -0,0 +1,296 @@
+import math
+
+from collections import deque
+
+import numpy as np
+
+from trader.column import Column
+
+
+class RollingWindow:
+    """
+    Mean and sample standard deviation over the last ``size`` values.
+
+    Running sums are kept relative to the first value seen to limit the
+    cancellation error on prices that barely move. Like pandas' rolling with
+    ``min_periods=size``, the result is NaN until the window is full and
+    while it holds a NaN.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.values = deque()
+        self.sum = 0.0
+        self.sumsq = 0.0
+        self.nans = 0
+        self.shift = None
+
+    def add(self, x, commit=True):
+        """
+        :params x: new value
+        :params commit: keep x in the window, otherwise only evaluate with it
+        :returns: (mean, std) of the window ending with x
+        """
+
+        if self.shift is None and not math.isnan(x):
+            self.shift = x
+        total, sumsq, nans = self.sum, self.sumsq, self.nans
+        total, sumsq, nans = self._fold(total, sumsq, nans, x, 1)
+        if len(self.values) == self.size:
+            total, sumsq, nans = self._fold(total, sumsq, nans, self.values[0], -1)
+            count = self.size
+        else:
+            count = len(self.values) + 1
+
+        if commit:
+            if len(self.values) == self.size:
+                self.values.popleft()
+            self.values.append(x)
+            self.sum, self.sumsq, self.nans = total, sumsq, nans
+
+        if count < self.size or nans:
+            return math.nan, math.nan
+        mean = total / count
+        var = max((sumsq - total * mean) / (count - 1), 0.0) if count > 1 else math.nan
+        return mean + self.shift, math.sqrt(var)
+
+    def _fold(self, total, sumsq, nans, x, sign):
+        if math.isnan(x):
+            return total, sumsq, nans + sign
+        d = x - self.shift
+        return total + sign * d, sumsq + sign * d * d, nans
+
+
+class RollingExtrema:
+    """
+    Highest and lowest value over the last ``size`` values.
+
+    Monotonic deques of (position, value) give both extrema in amortized
+    O(1) per new value.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.count = 0
+        self.last_nan = -size
+        self.highs = deque()
+        self.lows = deque()
+
+    def add(self, high, low, commit=True):
+        """
+        :params high: new value for the maximum
+        :params low: new value for the minimum
+        :params commit: keep the values, otherwise only evaluate with them
+        :returns: (max, min) of the window ending with the new values
+        """
+
+        i = self.count
+        oldest = i - self.size + 1
+        has_nan = math.isnan(high) or math.isnan(low)
+        top = high
+        for j, value in self.highs:
+            if j >= oldest:
+                top = max(top, value)
+                break
+        bottom = low
+        for j, value in self.lows:
+            if j >= oldest:
+                bottom = min(bottom, value)
+                break
+        nan_in_window = self.last_nan >= oldest or has_nan
+
+        if commit:
+            if has_nan:
+                self.last_nan = i
+            else:
+                while self.highs and self.highs[-1][1] <= high:
+                    self.highs.pop()
+                self.highs.append((i, high))
+                while self.lows and self.lows[-1][1] >= low:
+                    self.lows.pop()
+                self.lows.append((i, low))
+            while self.highs and self.highs[0][0] < oldest:
+                self.highs.popleft()
+            while self.lows and self.lows[0][0] < oldest:
+                self.lows.popleft()
+            self.count += 1
+
+        if i + 1 < self.size or nan_in_window:
+            return math.nan, math.nan
+        return top, bottom
+
+
+class Lag:
+    """Value seen ``n`` steps before the new one."""
+
+    def __init__(self, n):
+        self.values = deque(maxlen=n)
+
+    def add(self, x, commit=True):
+        prior = self.values[0] if len(self.values) == self.values.maxlen else math.nan
+        if commit:
+            self.values.append(x)
+        return prior
+
+
+class Ema:
+    """Exponential moving average, as ``ewm(span=span, adjust=False)``."""
+
+    def __init__(self, span):
+        self.alpha = 2.0 / (span + 1)
+        self.value = math.nan
+        self.skipped = 0  # NaN values since the last update
+
+    def add(self, x, commit=True):
+        skipped = self.skipped
+        if math.isnan(x):
+            value = self.value
+            skipped += 1
+        elif math.isnan(self.value):
+            value = x
+            skipped = 0
+        else:
+            # like pandas, the previous average keeps decaying across NaNs
+            decay = (1 - self.alpha) ** (skipped + 1)
+            value = (decay * self.value + self.alpha * x) / (decay + self.alpha)
+            skipped = 0
+        if commit:
+            self.value, self.skipped = value, skipped
+        return value
+
+
+class IndicatorEngine:
+    """
+    Streaming study values of one (pair, period) candle series.
+
+    Closed candles are committed once, in O(1) each. The last candle is
+    still open, so its values are evaluated from the committed state on
+    every sync without being kept.
+    """
+
+    columns = (
+        "ma",
+        "ema",
+        "bb_upper",
+        "bb_mean",
+        "bb_lower",
+        "accumulation",
+        "cci",
+        "roc",
+        "stoc",
+        "mom",
+        "pp",
+        "r1",
+        "s1",
+        "r2",
+        "s2",
+        "r3",
+        "s3",
+    )
+
+    def __init__(
+        self,
+        ma_window=5,
+        ema_span=20,
+        bb_window=10,
+        bb_num_of_std=5,
+        cci_window=10,
+        roc_days=5,
+        stoc_window=14,
+        mom_days=5,
+    ):
+        self.ma_window = ma_window
+        self.ema_span = ema_span
+        self.bb_window = bb_window
+        self.bb_num_of_std = bb_num_of_std
+        self.cci_window = cci_window
+        self.roc_days = roc_days
+        self.stoc_window = stoc_window
+        self.mom_days = mom_days
+        self.reset()
+
+    def __len__(self):
+        return len(self.data["ma"])
+
+    def reset(self):
+        self.ma = RollingWindow(self.ma_window)
+        self.ema = Ema(self.ema_span)
+        self.bb = RollingWindow(self.bb_window)
+        self.cci = RollingWindow(self.cci_window)
+        self.roc = Lag(self.roc_days)
+        self.mom = Lag(self.mom_days)
+        self.stoc = RollingExtrema(self.stoc_window)
+        self.data = {name: Column(np.float64) for name in self.columns}
+        self.live = None
+
+    def sync(self, candles):
+        """
+        Commit the closed candles and evaluate the open one
+
+        :params candles: CandleSeries, whose last candle is still open
+        """
+
+        last = len(candles) - 1
+        opens, highs, lows, closes = (
+            candles.open.values,
+            candles.high.values,
+            candles.low.values,
+            candles.close.values,
+        )
+        for i in range(len(self), last):
+            values = self._step(opens[i], highs[i], lows[i], closes[i], True)
+            for name in self.columns:
+                self.data[name].append(values[name])
+        self.live = (
+            self._step(opens[last], highs[last], lows[last], closes[last], False)
+            if last >= 0
+            else None
+        )
+
+    def series(self, name):
+        """
+        :params name: one of the engine columns
+        :returns: numpy array with one value per candle
+        """
+
+        if self.live is None:
+            return self.data[name].values
+        return self.data[name].with_last(self.live[name])
+
+    def _step(self, open_, high, low, close, commit):
+        values = {}
+
+        values["ma"] = self.ma.add(close, commit)[0]
+        values["ema"] = self.ema.add(close, commit)
+
+        mean, std = self.bb.add(close, commit)
+        values["bb_mean"] = mean
+        values["bb_upper"] = mean + std * self.bb_num_of_std
+        values["bb_lower"] = mean - std * self.bb_num_of_std
+
+        spread = high - low
+        values["accumulation"] = (
+            ((close - low) - (high - close)) / spread if spread else math.nan
+        )
+
+        tp = (high + low + close) / 3
+        mean, std = self.cci.add(tp, commit)
+        values["cci"] = (tp - mean) / (0.015 * std) if std else math.nan
+
+        prior = self.roc.add(close, commit)
+        values["roc"] = (close - prior) / prior
+        values["mom"] = close - self.mom.add(close, commit)
+
+        highest, lowest = self.stoc.add(high, low, commit)
+        values["stoc"] = (
+            (close - lowest) / (highest - lowest) if highest != lowest else math.nan
+        )
+
+        values["pp"] = tp
+        values["r1"] = 2 * tp - low
+        values["s1"] = 2 * tp - high
+        values["r2"] = tp + high - low
+        values["s2"] = tp - high + low
+        values["r3"] = high + 2 * (tp - low)
+        values["s3"] = low - 2 * (high - tp)
+        return values
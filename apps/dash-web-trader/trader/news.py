@@ -0,0 +1,115 @@
+import datetime
+import json
+import logging
+import threading
+
+import requests
+
+
+NEWS_API_URL = "https://newsapi.org/v2/top-headlines"
+
+logger = logging.getLogger(__name__)
+
+
+def parse_articles(payload):
+    """
+    :params payload: newsapi.org response body
+    :returns: list of (title, url) tuples
+    """
+
+    return [
+        (article["title"], article["url"])
+        for article in payload.get("articles", [])
+        if article.get("title") and article.get("url")
+    ]
+
+
+class HttpNewsSource:
+    """Top headlines of a newsapi.org source."""
+
+    def __init__(self, api_key, sources="bbc-news", timeout=5):
+        self.params = {"sources": sources, "apiKey": api_key}
+        self.timeout = timeout
+
+    def __call__(self):
+        response = requests.get(NEWS_API_URL, params=self.params, timeout=self.timeout)
+        response.raise_for_status()
+        return parse_articles(response.json())
+
+
+class FileNewsSource:
+    """Headlines read from a local JSON file in the newsapi.org format."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __call__(self):
+        with open(self.path) as f:
+            return parse_articles(json.load(f))
+
+
+class NewsFeed:
+    """
+    Headlines shared by all sessions, refreshed by a background thread.
+
+    ``snapshot`` never blocks on the source: it returns the last good
+    headlines, which are empty until the first fetch succeeds. A failed
+    fetch keeps the previous headlines.
+    """
+
+    def __init__(self, source, ttl=60):
+        """
+        :params source: callable returning a list of (title, url)
+        :params ttl: seconds between refreshes
+        """
+
+        self.source = source
+        self.ttl = ttl
+        self._headlines = []
+        self._fetched_at = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the refresher thread, fetching right away."""
+
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="news-refresher", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def refresh(self):
+        """
+        Fetch the headlines from the source
+
+        :returns: True when the snapshot was replaced
+        """
+
+        try:
+            headlines = self.source()
+        except Exception:
+            logger.warning("Could not refresh headlines", exc_info=True)
+            return False
+        with self._lock:
+            self._headlines = headlines
+            self._fetched_at = datetime.datetime.now()
+        return True
+
+    def snapshot(self):
+        """
+        :returns: (headlines, fetch time or None)
+        """
+
+        with self._lock:
+            return self._headlines, self._fetched_at
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.refresh()
+            self._stop.wait(self.ttl)
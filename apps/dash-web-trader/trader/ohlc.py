@@ -0,0 +1,198 @@
+import threading
+
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from pandas.tseries.frequencies import to_offset
+from trader.column import Column
+from trader.indicators import IndicatorEngine
+
+
+# Identifies the candles of a period: the closed candles only change with the
+# generation and the time of the last closed candle, the still forming last
+# candle changes with every folded tick
+Stamp = namedtuple("Stamp", "generation, cursor, candles, closed, last")
+
+
+class CandleSeries:
+    """
+    OHLC candles of fixed width, extended incrementally from new ticks.
+
+    Buckets are aligned on multiples of the width like
+    ``Series.resample(period).ohlc()``, and periods without ticks are kept
+    as NaN candles. The study values are streamed alongside the candles.
+    """
+
+    def __init__(self, period):
+        """
+        :params period: pandas offset alias such as "15Min"
+        """
+
+        self.period = period
+        self.width = to_offset(period).nanos
+        self.time = Column(np.int64)
+        self.open = Column(np.float64)
+        self.high = Column(np.float64)
+        self.low = Column(np.float64)
+        self.close = Column(np.float64)
+        self.indicators = IndicatorEngine()
+
+    def __len__(self):
+        return len(self.time)
+
+    def clear(self):
+        for column in (self.time, self.open, self.high, self.low, self.close):
+            column.clear()
+        self.indicators.reset()
+
+    def extend(self, timestamps, prices):
+        """
+        Fold new ticks into the candles
+
+        :params timestamps: sorted int64 nanoseconds, all after the last folded tick
+        :params prices: float prices matching timestamps
+        """
+
+        if len(timestamps):
+            self._fold(timestamps, prices)
+            self.indicators.sync(self)
+
+    def _fold(self, timestamps, prices):
+        buckets = timestamps - timestamps % self.width
+        starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        ends = np.r_[starts[1:], len(buckets)]
+        times = buckets[starts]
+        opens = prices[starts]
+        highs = np.maximum.reduceat(prices, starts)
+        lows = np.minimum.reduceat(prices, starts)
+        closes = prices[ends - 1]
+
+        # The first new bucket may continue the last (still open) candle
+        if len(self) and times[0] == self.time.values[-1]:
+            high = self.high.values
+            low = self.low.values
+            high[-1] = max(high[-1], highs[0])
+            low[-1] = min(low[-1], lows[0])
+            self.close.values[-1] = closes[0]
+            times, opens, highs, lows, closes = (
+                times[1:],
+                opens[1:],
+                highs[1:],
+                lows[1:],
+                closes[1:],
+            )
+            if not len(times):
+                return
+
+        first = self.time.values[-1] + self.width if len(self) else times[0]
+        dense = np.arange(first, times[-1] + self.width, self.width, dtype=np.int64)
+        positions = (times - first) // self.width
+        self.time.extend(dense)
+        for column, values in (
+            (self.open, opens),
+            (self.high, highs),
+            (self.low, lows),
+            (self.close, closes),
+        ):
+            filled = np.full(len(dense), np.nan)
+            filled[positions] = values
+            column.extend(filled)
+
+    def frame(self, start=0, stop=None):
+        """
+        :params start: index of the first candle to include
+        :params stop: index after the last candle to include, all by default
+        :returns: pandas dataframe with open, high, low and close columns
+            followed by the IndicatorEngine columns
+        """
+
+        data = {
+            "open": self.open.values[start:stop],
+            "high": self.high.values[start:stop],
+            "low": self.low.values[start:stop],
+            "close": self.close.values[start:stop],
+        }
+        for name in IndicatorEngine.columns:
+            data[name] = self.indicators.series(name)[start:stop]
+        return pd.DataFrame(
+            data,
+            index=pd.to_datetime(self.time.values[start:stop]),
+            columns=list(data),
+        )
+
+
+class OHLCPyramid:
+    """
+    Candles of one currency pair at every chart period.
+
+    Ticks are folded in as the replay clock advances, so a chart refresh only
+    pays for the ticks received since the previous one. ``generation`` is
+    bumped whenever the replay wraps around and the candles are rebuilt.
+    """
+
+    def __init__(self, index, prices, periods):
+        """
+        :params index: TickIndex of the pair
+        :params prices: float prices aligned with the index
+        :params periods: pandas offset aliases to maintain
+        """
+
+        self.index = index
+        self.prices = np.asarray(prices, dtype=np.float64)
+        self.levels = {period: CandleSeries(period) for period in periods}
+        self.cursor = 0  # number of ticks folded into the candles
+        self.generation = 0
+        self._lock = threading.Lock()
+
+    def advance(self, t):
+        """
+        Fold all the ticks up to t into the candles
+
+        :params t: datetime-like replay time
+        """
+
+        stop = self.index.at_or_before(t) + 1
+        with self._lock:
+            if stop < self.cursor:
+                for level in self.levels.values():
+                    level.clear()
+                self.cursor = 0
+                self.generation += 1
+            if stop > self.cursor:
+                timestamps = self.index.timestamps[self.cursor : stop]
+                prices = self.prices[self.cursor : stop]
+                for level in self.levels.values():
+                    level.extend(timestamps, prices)
+                self.cursor = stop
+
+    def stamp(self, period):
+        """
+        Identify the candles of a period, for use in cache keys
+
+        :params period: one of the maintained periods
+        :returns: Stamp
+        """
+
+        with self._lock:
+            level = self.levels[period]
+            times = level.time.values
+            return Stamp(
+                self.generation,
+                self.cursor,
+                len(level),
+                int(times[-2]) if len(level) > 1 else None,
+                int(times[-1]) if len(level) else None,
+            )
+
+    def frame(self, period, start=0, stop=None):
+        """
+        :params period: one of the maintained periods
+        :params start: index of the first candle to include
+        :params stop: index after the last candle to include, all by default
+        :returns: pandas dataframe of the candles folded so far
+        """
+
+        with self._lock:
+            return self.levels[period].frame(start, stop)
@@ -0,0 +1,405 @@
+import contextlib
+import datetime
+import pickle
+import sqlite3
+import threading
+import time
+
+from collections import OrderedDict, defaultdict
+
+import numpy as np
+
+from trader.column import Column
+from trader.triggers import TriggerBook
+
+
+# Size of a lot in units of the base currency
+LOT_SIZE = 100000
+
+
+def now_str():
+    return datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def pip_size(symbol):
+    """Price increment of a TPS (one point) for the SL and TP distances."""
+
+    return 0.001 if symbol[3:] == "JPY" else 0.00001
+
+
+def trigger_levels(symbol, type_order, price, sl_points, tp_points):
+    """
+    Stop loss and take profit prices from distances in points
+
+    :params symbol: currency pair
+    :params type_order: "buy" or "sell"
+    :params price: opening price
+    :params sl_points: stop loss distance, 0 or None for none
+    :params tp_points: take profit distance, 0 or None for none
+    :returns: (sl, tp) prices, 0 for none
+    """
+
+    side = 1 if type_order == "buy" else -1
+    pip = pip_size(symbol)
+    sl = price - side * sl_points * pip if sl_points else 0
+    tp = price + side * tp_points * pip if tp_points else 0
+    return sl, tp
+
+
+class Positions:
+    """
+    Open positions as parallel numpy columns, one row per order.
+
+    ``ids`` holds the order id of every row and ``rows`` maps ids back to
+    row numbers.
+    """
+
+    def __init__(self):
+        self.symbol = Column(np.int16)  # index in the book's currencies
+        self.side = Column(np.int8)  # 1 for buy, -1 for sell
+        self.volume = Column(np.float64)
+        self.price = Column(np.float64)
+        self.sl = Column(np.float64)
+        self.tp = Column(np.float64)
+        self.profit = Column(np.float64)  # profit rounded to cents
+        self.ids = []
+        self.rows = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _columns(self):
+        return (
+            self.symbol,
+            self.side,
+            self.volume,
+            self.price,
+            self.sl,
+            self.tp,
+            self.profit,
+        )
+
+    def append(self, order_id, symbol, side, volume, price, sl, tp):
+        self.rows[order_id] = len(self.ids)
+        self.ids.append(order_id)
+        for column, value in zip(
+            self._columns(), (symbol, side, volume, price, sl, tp, 0.0)
+        ):
+            column.append(value)
+
+    def remove(self, mask):
+        """
+        :params mask: boolean array, True for the rows to drop
+        :returns: ids of the dropped rows
+        """
+
+        keep = ~mask
+        removed = [order_id for order_id, k in zip(self.ids, keep) if not k]
+        for column in self._columns():
+            column.compress(keep)
+        self.ids = [order_id for order_id, k in zip(self.ids, keep) if k]
+        self.rows = {order_id: row for row, order_id in enumerate(self.ids)}
+        return removed
+
+
+class OrderBook:
+    """
+    Orders of one trading session, indexed by id and by symbol.
+
+    Open positions are kept in columns so that marking them to market is
+    done for all of them at once, while their stop loss and take profit
+    levels rest in a TriggerBook that only returns the crossed ones. Each
+    order is closed exactly once, with a record appended to ``audit``.
+
+    Every change bumps ``revision`` and stamps the order with it, so a client
+    that last saw revision r only needs the orders stamped after r.
+    """
+
+    def __init__(self, currencies):
+        self.currencies = list(currencies)
+        self.codes = {symbol: code for code, symbol in enumerate(self.currencies)}
+        self.orders = OrderedDict()  # id -> order dict
+        self.by_symbol = defaultdict(list)  # symbol -> order ids
+        self.positions = Positions()
+        self.triggers = TriggerBook()
+        self.audit = []  # one record per closed order
+        self.realized = 0.0  # profit of the closed orders
+        self.revision = 0
+        self._revisions = OrderedDict()  # id -> last change, oldest first
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.orders)
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+
+    def add(self, symbol, type_order, volume, price, sl, tp):
+        """
+        Open a new order
+
+        :params symbol: currency pair
+        :params type_order: "buy" or "sell"
+        :params volume: lots
+        :params price: opening price
+        :params sl: stop loss price, 0 for none
+        :params tp: take profit price, 0 for none
+        :returns: order dict
+        """
+
+        with self._lock:
+            order_id = symbol + str(len(self.by_symbol[symbol]))
+            order = {
+                "id": order_id,
+                "time": now_str(),
+                "type": type_order,
+                "volume": volume,
+                "symbol": symbol,
+                "tp": tp,
+                "sl": sl,
+                "price": price,
+                "profit": "0.00",
+                "status": "open",
+            }
+            self.orders[order_id] = order
+            self.by_symbol[symbol].append(order_id)
+            self.positions.append(
+                order_id,
+                self.codes[symbol],
+                1 if type_order == "buy" else -1,
+                volume,
+                price,
+                sl,
+                tp,
+            )
+            self.triggers.add(order_id, symbol, type_order, sl, tp)
+            self._touch(order_id)
+            return order
+
+    def update(self, current_bids, current_asks, id_to_close=None):
+        """
+        Mark open orders to market and close the triggered ones
+
+        :params current_bids: bids in the order of ``currencies``
+        :params current_asks: asks in the order of ``currencies``
+        :params id_to_close: id of an order closed by the user
+        """
+
+        with self._lock:
+            positions = self.positions
+            if not len(positions):
+                return
+
+            bids = np.asarray(current_bids, dtype=np.float64)
+            asks = np.asarray(current_asks, dtype=np.float64)
+            codes = positions.symbol.values
+            side = positions.side.values
+            price = positions.price.values
+
+            # buy positions close at the bid, sell positions at the ask
+            mark = np.where(side > 0, bids[codes], asks[codes])
+            profit = np.round(
+                positions.volume.values * LOT_SIZE * side * (mark - price) / price, 2
+            )
+
+            reasons = OrderedDict()  # closing order id -> "manual", "tp" or "sl"
+            if id_to_close in positions.rows:
+                self.triggers.cancel(id_to_close)
+                reasons[id_to_close] = "manual"
+            for code, symbol in enumerate(self.currencies):
+                for order_id, kind in self.triggers.fire(
+                    symbol, bids[code], asks[code]
+                ):
+                    reasons[order_id] = kind
+            closing = np.zeros(len(positions), dtype=bool)
+            closing[[positions.rows[order_id] for order_id in reasons]] = True
+
+            for row in np.flatnonzero((profit != positions.profit.values) | closing):
+                order = self.orders[positions.ids[row]]
+                order["profit"] = "%.2f" % profit[row]
+                self._touch(order["id"])
+            positions.profit.values[:] = profit
+
+            if reasons:
+                rows = np.flatnonzero(closing)
+                for row, order_id in zip(rows, positions.remove(closing)):
+                    self._close(order_id, float(mark[row]), reasons[order_id])
+
+    def _close(self, order_id, price, reason):
+        order = self.orders[order_id]
+        order["status"] = "closed"
+        order["close Time"] = now_str()
+        order["close Price"] = price
+        self.realized += float(order["profit"])
+        self._touch(order_id)
+        self.audit.append(
+            {
+                "id": order_id,
+                "reason": reason,
+                "time": order["close Time"],
+                "price": price,
+                "profit": order["profit"],
+                "revision": self.revision,
+            }
+        )
+
+    def summary(self):
+        """
+        :returns: dict with the open profit, used margin, realized profit and
+            the number of open and closed orders
+        """
+
+        with self._lock:
+            positions = self.positions
+            codes = positions.symbol.values
+            usd_base = np.array(
+                [symbol[:3] == "USD" for symbol in self.currencies], dtype=bool
+            )
+            conversion_price = np.where(usd_base[codes], 1.0, positions.price.values)
+            margin = positions.volume.values * LOT_SIZE / (200 * conversion_price)
+            return {
+                "open_pl": float(positions.profit.values.sum()),
+                "margin": float(margin.sum()),
+                "realized": self.realized,
+                "open": len(positions),
+                "closed": len(self.orders) - len(positions),
+            }
+
+    def open_ids(self):
+        with self._lock:
+            return list(self.positions.ids)
+
+    def changes(self, since):
+        """
+        :params since: revision the client already has, None for none
+        :returns: (revision, reset, orders changed after since); reset is True
+            when the client must drop what it has and use the orders as is
+        """
+
+        with self._lock:
+            reset = since is None or since > self.revision
+            since = 0 if reset else since
+            changed = []
+            for order_id, revision in reversed(self._revisions.items()):
+                if revision <= since:
+                    break
+                changed.append(dict(self.orders[order_id]))
+            changed.reverse()
+            return self.revision, reset, changed
+
+    def _touch(self, order_id):
+        self.revision += 1
+        self._revisions[order_id] = self.revision
+        self._revisions.move_to_end(order_id)
+
+
+# Books of the sessions, pickled along with their revision
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS books ("
+    "session_id TEXT PRIMARY KEY, revision INTEGER NOT NULL, "
+    "last_seen REAL NOT NULL, book BLOB NOT NULL);"
+)
+
+
+class OrderStore:
+    """
+    Order books keyed by session id, shared by the worker processes through
+    a SQLite file.
+
+    Each book is stored pickled with its revision. A worker keeps the books
+    it loaded and only unpickles one again when another worker saved a
+    different revision, and only saves a book whose revision changed. Every
+    access runs in a write transaction, so the requests of a session are
+    applied one at a time whichever worker they reach.
+
+    Books of sessions idle for longer than ``ttl`` seconds are dropped.
+    """
+
+    def __init__(self, path, currencies, ttl=24 * 3600):
+        """
+        :params path: SQLite database file, created if missing
+        :params currencies: currency pairs of the books
+        :params ttl: seconds a book is kept after its last use
+        """
+
+        self.path = path
+        self.currencies = list(currencies)
+        self.ttl = ttl
+        self._books = {}  # session id -> book loaded by this process
+        self._last_seen = {}  # session id -> last use in this process
+        self._local = threading.local()
+
+    def _connection(self):
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+            con.execute("PRAGMA journal_mode=WAL;")
+            con.execute(SCHEMA)
+            self._local.con = con
+        return con
+
+    @contextlib.contextmanager
+    def session(self, session_id):
+        """
+        Order book of a session, created on first use, the changes made to
+        it in the block are saved when the block exits without error
+
+        :params session_id: id stored in the client layout
+        :returns: context manager giving the OrderBook
+        """
+
+        con = self._connection()
+        now = time.time()
+        con.execute("BEGIN IMMEDIATE;")
+        try:
+            row = con.execute(
+                "SELECT revision FROM books WHERE session_id = ?;", (session_id,)
+            ).fetchone()
+            book = self._books.get(session_id)
+            if row is None:
+                self._expire(con, now)
+                book = OrderBook(self.currencies)
+            elif book is None or book.revision != row[0]:
+                (blob,) = con.execute(
+                    "SELECT book FROM books WHERE session_id = ?;", (session_id,)
+                ).fetchone()
+                book = pickle.loads(blob)
+            revision = book.revision
+
+            yield book
+
+            if row is None or book.revision != revision:
+                con.execute(
+                    "INSERT OR REPLACE INTO books VALUES (?, ?, ?, ?);",
+                    (
+                        session_id,
+                        book.revision,
+                        now,
+                        pickle.dumps(book, pickle.HIGHEST_PROTOCOL),
+                    ),
+                )
+            else:
+                con.execute(
+                    "UPDATE books SET last_seen = ? WHERE session_id = ?;",
+                    (now, session_id),
+                )
+            self._books[session_id] = book
+            self._last_seen[session_id] = now
+            con.execute("COMMIT;")
+        except BaseException:
+            con.execute("ROLLBACK;")
+            self._books.pop(session_id, None)  # may hold unsaved changes
+            raise
+
+    def _expire(self, con, now):
+        con.execute("DELETE FROM books WHERE last_seen < ?;", (now - self.ttl,))
+        for session_id, seen in list(self._last_seen.items()):
+            if now - seen > self.ttl:
+                self._books.pop(session_id, None)
+                del self._last_seen[session_id]
@@ -0,0 +1,165 @@
+import threading
+
+import numpy as np
+
+from collections import OrderedDict, namedtuple
+
+
+# row is "main" for chart styles, "overlay" for studies drawn over the
+# candles and "subplot" for studies that get their own row
+Builder = namedtuple("Builder", "name, func, row, params")
+
+ROWS = ("main", "overlay", "subplot")
+
+
+def join_traces(head, tail):
+    """
+    :params head: plotly trace dict
+    :params tail: trace dict of the same builder computed from later candles
+    :returns: head with the per-candle arrays of tail appended
+    """
+
+    trace = dict(head)
+    for key, values in tail.items():
+        if not isinstance(values, (np.ndarray, list, tuple)):
+            continue
+        if len(head.get(key, ())):
+            trace[key] = np.concatenate([np.asarray(head[key]), np.asarray(values)])
+        else:
+            trace[key] = values
+    return trace
+
+
+class LRUCache:
+    """Thread-safe mapping that keeps the ``maxsize`` most recently used keys."""
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get_or_set(self, key, compute):
+        """
+        :params key: hashable key
+        :params compute: zero-argument callable producing the value on a miss
+        :returns: cached value
+        """
+
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+
+        # compute outside the lock, concurrent misses on one key are harmless
+        value = compute()
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class TraceRegistry:
+    """
+    Named chart style and study builders with memoized traces.
+
+    A builder takes the candle dataframe plus its declared parameters and
+    returns one trace or a list of traces, reading one row per candle. The
+    plotly trace dicts of the closed candles are cached under (name, pair,
+    period, generation, last closed candle time, start, parameters), where
+    start is the first candle of the frame, so they are built once per
+    candle and shared by every client viewing the same pair and period. The
+    still forming last candle changes with every tick, its points are built
+    from a one row frame on each call and appended to the cached ones.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+        self._builders = OrderedDict()
+
+    def __contains__(self, name):
+        return name in self._builders
+
+    def __iter__(self):
+        return iter(self._builders.values())
+
+    def register(self, name, row, **params):
+        """
+        Decorator registering a builder
+
+        :params name: value used by the style and studies menus
+        :params row: one of ROWS
+        :params params: keyword arguments passed to the builder
+        """
+
+        if row not in ROWS:
+            raise ValueError("Unknown row {!r} for {!r}".format(row, name))
+
+        def decorator(func):
+            self._builders[name] = Builder(
+                name, func, row, tuple(sorted(params.items()))
+            )
+            return func
+
+        return decorator
+
+    def get(self, name):
+        """
+        :params name: registered builder name
+        :returns: Builder
+        """
+
+        try:
+            return self._builders[name]
+        except KeyError:
+            raise ValueError("Unknown chart trace {!r}".format(name))
+
+    def traces(self, name, pair, period, stamp, frame, start=0):
+        """
+        :params name: registered builder name
+        :params pair: currency pair
+        :params period: candle period
+        :params stamp: Stamp of the candles, see OHLCPyramid.stamp
+        :params frame: callable taking the index of the first candle and the
+            index after the last one, returning the candle dataframe
+        :params start: index of the first candle in the dataframe
+        :returns: list of plotly trace dicts
+        """
+
+        builder = self.get(name)
+        closed = max(stamp.candles - 1, start)  # index of the forming candle
+        key = (
+            name,
+            pair,
+            period,
+            stamp.generation,
+            stamp.closed,
+            start,
+            builder.params,
+        )
+        history = self.cache.get_or_set(
+            key, lambda: self._build(builder, frame(start, closed))
+        )
+        live = self._build(builder, frame(closed, stamp.candles))
+        return [
+            join_traces(trace, live_trace) for trace, live_trace in zip(history, live)
+        ]
+
+    @staticmethod
+    def _build(builder, frame):
+        traces = builder.func(frame, **dict(builder.params))
+        if not isinstance(traces, (list, tuple)):
+            traces = [traces]
+        return [trace.to_plotly_json() for trace in traces]
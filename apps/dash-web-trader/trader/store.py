@@ -0,0 +1,126 @@
+import argparse
+import os
+import pathlib
+
+import numpy as np
+import pandas as pd
+
+
+# Columns of a pair in the store, one .npy file each
+COLUMNS = (("time", np.int64), ("bid", np.float64), ("ask", np.float64))
+
+
+class PairTicks:
+    """
+    Read-only columns of the ticks of one currency pair.
+
+    The arrays are memory-mapped, so every worker process shares the same
+    pages through the OS cache instead of keeping its own parsed copy.
+    """
+
+    def __init__(self, symbol, time, bid, ask):
+        self.symbol = symbol
+        self.time = time  # int64 nanoseconds since the epoch, sorted
+        self.bid = bid
+        self.ask = ask
+
+    def __len__(self):
+        return len(self.time)
+
+    def row(self, index):
+        """
+        :params index: tick position
+        :returns: [symbol, bid, ask]
+        """
+
+        return [self.symbol, self.bid[index], self.ask[index]]
+
+
+def write_columns(pair_path, values):
+    """
+    Write the store columns of a pair
+
+    Every column is written to a temporary file and renamed into place, so
+    concurrent readers never see a partially written file.
+
+    :params pair_path: directory receiving the columns
+    :params values: dict of column name to array
+    """
+
+    pair_path = pathlib.Path(pair_path)
+    pair_path.mkdir(parents=True, exist_ok=True)
+    for name, dtype in COLUMNS:
+        tmp_path = pair_path.joinpath("{}.{}.tmp.npy".format(name, os.getpid()))
+        np.save(str(tmp_path), np.ascontiguousarray(values[name], dtype=dtype))
+        os.replace(str(tmp_path), str(pair_path.joinpath(name + ".npy")))
+
+
+def convert_csv(csv_path, pair_path):
+    """
+    Convert a tick CSV (Symbol, Date, Bid, Ask, ...) into store columns
+
+    :params csv_path: path of the CSV file
+    :params pair_path: directory receiving the columns
+    """
+
+    df = pd.read_csv(csv_path, usecols=["Date", "Bid", "Ask"], parse_dates=["Date"])
+    df = df.sort_values("Date", kind="mergesort")
+    values = {
+        "time": df["Date"].values.astype("datetime64[ns]").view(np.int64),
+        "bid": df["Bid"].values,
+        "ask": df["Ask"].values,
+    }
+    write_columns(pair_path, values)
+
+
+class TickStore:
+    """
+    Directory of memory-mapped tick columns, one subdirectory per pair.
+
+    Pairs missing from the store are converted from ``<csv_path>/<pair>.csv``
+    the first time they are loaded.
+    """
+
+    def __init__(self, path, csv_path=None):
+        """
+        :params path: store directory
+        :params csv_path: directory of the source CSV files
+        """
+
+        self.path = pathlib.Path(path)
+        self.csv_path = pathlib.Path(csv_path) if csv_path is not None else None
+
+    def has(self, pair):
+        return all(
+            self.path.joinpath(pair, name + ".npy").exists() for name, _ in COLUMNS
+        )
+
+    def load(self, pair):
+        """
+        :params pair: currency pair name
+        :returns: PairTicks backed by memory maps
+        """
+
+        if not self.has(pair):
+            if self.csv_path is None:
+                raise FileNotFoundError("No ticks stored for {}".format(pair))
+            convert_csv(self.csv_path.joinpath(pair + ".csv"), self.path.joinpath(pair))
+
+        columns = {
+            name: np.load(str(self.path.joinpath(pair, name + ".npy")), mmap_mode="r")
+            for name, _ in COLUMNS
+        }
+        return PairTicks(pair, **columns)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Convert tick CSV files into the memory-mapped tick store."
+    )
+    parser.add_argument("csv_dir", help="directory containing <PAIR>.csv files")
+    parser.add_argument("store_dir", help="output store directory")
+    args = parser.parse_args()
+
+    for csv_file in sorted(pathlib.Path(args.csv_dir).glob("*.csv")):
+        convert_csv(csv_file, pathlib.Path(args.store_dir).joinpath(csv_file.stem))
+        print("converted", csv_file.stem)
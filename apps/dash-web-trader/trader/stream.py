@@ -0,0 +1,162 @@
+import json
+import logging
+import queue
+import threading
+import time
+
+from collections import OrderedDict
+
+
+logger = logging.getLogger(__name__)
+
+
+def format_event(event, data):
+    """
+    :params event: server-sent event name
+    :params data: JSON serializable payload
+    :returns: str in the text/event-stream format
+    """
+
+    return "event: {}\ndata: {}\n\n".format(event, json.dumps(data))
+
+
+class Broadcaster:
+    """
+    Fan-out of server-sent events to the connected browsers.
+
+    Each subscriber gets a bounded queue. Events are only refresh triggers,
+    so a subscriber that falls behind loses its oldest events rather than
+    holding up the others.
+    """
+
+    def __init__(self, maxsize=32, keepalive=15):
+        """
+        :params maxsize: events queued per subscriber
+        :params keepalive: seconds of silence before a comment is sent to keep
+            proxies from closing the connection
+        """
+
+        self.maxsize = maxsize
+        self.keepalive = keepalive
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._subscribers)
+
+    def publish(self, event, data):
+        """
+        :params event: server-sent event name
+        :params data: JSON serializable payload
+        """
+
+        message = format_event(event, data)
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            while True:
+                try:
+                    subscriber.put_nowait(message)
+                    break
+                except queue.Full:
+                    try:
+                        subscriber.get_nowait()
+                    except queue.Empty:
+                        pass
+
+    def listen(self):
+        """
+        Generator of the events published from now on, for a streaming response
+
+        :returns: iterator of str
+        """
+
+        subscriber = queue.Queue(self.maxsize)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        try:
+            yield "retry: 2000\n\n"  # reconnection delay of the browser
+            while True:
+                try:
+                    yield subscriber.get(timeout=self.keepalive)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+        finally:
+            with self._lock:
+                self._subscribers.discard(subscriber)
+
+
+class EventProducer:
+    """
+    Single loop polling the event sources and publishing what changed.
+
+    A source is a function returning the current payload of its event, or
+    None when there is none yet. The event is published when the payload
+    differs from the previous one. Sources are polled in one thread per
+    process no matter how many browsers are connected.
+    """
+
+    def __init__(self, broadcaster, interval=0.5):
+        """
+        :params broadcaster: Broadcaster the events are published to
+        :params interval: seconds between two polls of the sources
+        """
+
+        self.broadcaster = broadcaster
+        self.interval = interval
+        self._sources = OrderedDict()
+        self._polled_at = {}
+        self._published = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def source(self, event, every=0):
+        """
+        Decorator registering an event source
+
+        :params event: server-sent event name
+        :params every: minimum seconds between two polls of the source
+        """
+
+        def decorator(func):
+            self._sources[event] = (func, every)
+            return func
+
+        return decorator
+
+    def start(self):
+        """Start the producer thread if it is not running yet."""
+
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="event-producer", daemon=True
+                )
+                self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def poll(self):
+        """Poll the sources that are due and publish their changed events."""
+
+        now = time.monotonic()
+        for event, (func, every) in self._sources.items():
+            if now - self._polled_at.get(event, float("-inf")) < every:
+                continue
+            self._polled_at[event] = now
+            try:
+                data = func()
+            except Exception:
+                logger.warning("Event source %s failed", event, exc_info=True)
+                continue
+            if data is not None and data != self._published.get(event):
+                self._published[event] = data
+                self.broadcaster.publish(event, data)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.poll()
+            self._stop.wait(self.interval)
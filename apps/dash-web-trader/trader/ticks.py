@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+
+def to_ns(t):
+    """
+    Convert a datetime-like value to int64 nanoseconds since the epoch
+
+    :params t: datetime, pandas Timestamp, numpy datetime64 or int nanoseconds
+    :returns: int
+    """
+
+    if isinstance(t, (int, np.integer)):
+        return int(t)
+    return pd.Timestamp(t).value
+
+
+class TickIndex:
+    """
+    Sorted int64 nanosecond index of the ticks of one currency pair.
+
+    Built once at load time, every lookup is a binary search over the
+    timestamps instead of a scan of the whole DataFrame index.
+    """
+
+    def __init__(self, timestamps):
+        """
+        :params timestamps: sorted int64 nanosecond timestamps (e.g. DatetimeIndex.asi8)
+        """
+
+        self.timestamps = np.ascontiguousarray(timestamps, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def nearest(self, t):
+        """
+        Position of the tick closest to t
+
+        :params t: datetime-like
+        :returns: int row position
+        """
+
+        t = to_ns(t)
+        pos = int(np.searchsorted(self.timestamps, t))
+        if pos == 0:
+            return 0
+        if pos == len(self.timestamps):
+            return pos - 1
+        before = t - self.timestamps[pos - 1]
+        after = self.timestamps[pos] - t
+        return pos - 1 if before <= after else pos
+
+    def at_or_before(self, t):
+        """
+        Position of the last tick at or before t, -1 if t precedes every tick
+
+        :params t: datetime-like
+        :returns: int row position
+        """
+
+        return int(np.searchsorted(self.timestamps, to_ns(t), side="right")) - 1
@@ -0,0 +1,107 @@
+import heapq
+import itertools
+
+from collections import defaultdict
+
+
+# Heaps of resting levels as (side, kind): (sign, quote). A level fires once
+# sign * level <= sign * price, where price is the bid or the ask of the tick.
+# Buy positions close at the bid and sell positions at the ask.
+HEAPS = {
+    ("buy", "tp"): (1, "bid"),  # bid rose to the take profit
+    ("buy", "sl"): (-1, "bid"),  # bid fell to the stop loss
+    ("sell", "tp"): (-1, "ask"),  # ask fell to the take profit
+    ("sell", "sl"): (1, "ask"),  # ask rose to the stop loss
+}
+
+
+class TriggerBook:
+    """
+    Stop loss and take profit levels of resting orders, by symbol.
+
+    Levels sit in heaps ordered by how close they are to firing, so a new
+    quote only pops the orders whose threshold it crossed instead of
+    testing every order. Cancelled or filled orders are removed lazily.
+    """
+
+    def __init__(self):
+        self._heaps = defaultdict(list)  # (symbol, side, kind) -> heap
+        self._active = {}  # order id -> (symbol, number of resting levels)
+        self._seq = itertools.count()  # tie breaker, keeps heap entries comparable
+        self._stale = 0  # heap entries of orders that are no longer active
+
+    def __len__(self):
+        return len(self._active)
+
+    def __contains__(self, order_id):
+        return order_id in self._active
+
+    def add(self, order_id, symbol, side, sl, tp):
+        """
+        Rest the levels of an order
+
+        :params order_id: hashable order id
+        :params symbol: currency pair
+        :params side: "buy" or "sell"
+        :params sl: stop loss price, 0 for none
+        :params tp: take profit price, 0 for none
+        """
+
+        levels = 0
+        for kind, level in (("sl", sl), ("tp", tp)):
+            if level:
+                sign = HEAPS[(side, kind)][0]
+                heapq.heappush(
+                    self._heaps[(symbol, side, kind)],
+                    (sign * level, next(self._seq), order_id),
+                )
+                levels += 1
+        if levels:
+            self._active[order_id] = (symbol, levels)
+
+    def cancel(self, order_id):
+        """Forget the levels of an order, e.g. closed by the user."""
+
+        active = self._active.pop(order_id, None)
+        if active is not None:
+            self._stale += active[1]
+            self._compact()
+
+    def fire(self, symbol, bid, ask):
+        """
+        Pop the orders of a symbol whose level the quote crossed
+
+        :params symbol: currency pair
+        :params bid: current bid
+        :params ask: current ask
+        :returns: list of (order_id, kind) with kind "sl" or "tp"
+        """
+
+        quotes = {"bid": bid, "ask": ask}
+        fired = []
+        for (side, kind), (sign, quote) in HEAPS.items():
+            heap = self._heaps.get((symbol, side, kind))
+            if not heap:
+                continue
+            price = sign * quotes[quote]
+            while heap and heap[0][0] <= price:
+                order_id = heapq.heappop(heap)[2]
+                active = self._active.pop(order_id, None)
+                if active is None:
+                    self._stale -= 1
+                else:
+                    fired.append((order_id, kind))
+                    # the other level of the order, if any, is now stale
+                    self._stale += active[1] - 1
+        self._compact()
+        return fired
+
+    def _compact(self):
+        # drop stale entries once they outnumber the live ones
+        if self._stale <= max(1024, len(self._active)):
+            return
+        for key, heap in self._heaps.items():
+            live = [entry for entry in heap if entry[2] in self._active]
+            heapq.heapify(live)
+            self._heaps[key] = live
+        self._stale = 0
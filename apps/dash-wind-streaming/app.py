@@ -1,20 +1,35 @@
 import os
-import pathlib
-import numpy as np
+import math
+import functools
+import threading
 import datetime as dt
 import dash
 import dash_core_components as dcc
 import dash_html_components as html
 import plotly.graph_objs as go
 
+from dash import no_update
 from dash.exceptions import PreventUpdate
 from dash.dependencies import Input, Output, State
-from scipy.stats import rayleigh
-from db.api import get_wind_data, get_wind_data_by_id
+from db.buffer import LiveSource, ReplaySource, WindBuffer
+from histogram import SlidingHistogram, rayleigh_fit
+from rollup import Rollups
 
 
 GRAPH_INTERVAL = os.environ.get("GRAPH_INTERVAL", 5000)
 
+# Decimals of the wind speeds sent to the browser
+SPEED_DECIMALS = 2
+
+# Windows of the wind speed graph in seconds, the longer ones are served
+# from the rollups
+WINDOWS = [
+    (200, "200 sec"),
+    (3600, "1 hour"),
+    (6 * 3600, "6 hours"),
+    (24 * 3600, "24 hours"),
+]
+
 app = dash.Dash(
     __name__,
     meta_tags=[{"name": "viewport", "content": "width=device-width, initial-scale=1"}],
@@ -59,6 +74,16 @@ app.layout = html.Div(
                         html.Div(
                             [html.H6("WIND SPEED (MPH)", className="graph__title")]
                         ),
+                        dcc.RadioItems(
+                            id="wind-window",
+                            options=[
+                                {"label": label, "value": value}
+                                for value, label in WINDOWS
+                            ],
+                            value=WINDOWS[0][0],
+                            className="window__container",
+                            labelClassName="window__label",
+                        ),
                         dcc.Graph(
                             id="wind-speed",
                             figure=go.Figure(
@@ -73,6 +98,7 @@ app.layout = html.Div(
                             interval=int(GRAPH_INTERVAL),
                             n_intervals=0,
                         ),
+                        dcc.Store(id="wind-speed-state"),
                     ],
                     className="two-thirds column wind__speed__container",
                 ),
@@ -179,26 +205,137 @@ def get_current_time():
     return total_time
 
 
-@app.callback(
-    Output("wind-speed", "figure"), [Input("wind-speed-update", "n_intervals")]
+# Histogram of the speeds in the buffer, updated as readings arrive
+speed_histogram = SlidingHistogram(size=200)
+
+
+def update_histogram(readings, reset):
+    if reset:
+        speed_histogram.clear()
+    speed_histogram.extend(readings.speed)
+
+
+# Summaries of the last 24 hours for the longer windows
+wind_rollups = Rollups(span=WINDOWS[-1][0])
+
+# Last 200 readings, polled once per second for all the clients, from the
+# LiveWind table written by db.ingest when WIND_LIVE is set. Live readings
+# arrive at the ingestion rate rather than once per second, so the graph of
+# the buffer counts readings instead of seconds.
+if os.environ.get("WIND_LIVE"):
+    wind_source = LiveSource()
+    buffer_axis_title = "Readings Ago"
+else:
+    wind_source = ReplaySource(get_current_time)
+    buffer_axis_title = "Time Elapsed (sec)"
+wind_buffer = WindBuffer(
+    wind_source, size=200, interval=1.0, listeners=[update_histogram, wind_rollups.add],
 )
-def gen_wind_speed(interval):
+wind_buffer.backfill(wind_rollups.add, wind_rollups.span)
+
+
+def elapsed_axis(window):
     """
-    Generate the wind speed graph.
+    Time elapsed axis of the wind speed graph, x counts the seconds from the
+    start of the window
 
-    :params interval: update the graph based on an interval
+    :params window: window length in seconds
     """
 
-    total_time = get_current_time()
-    df = get_wind_data(total_time - 200, total_time)
+    unit, seconds = ("sec", 1) if window <= 200 else ("min", 60)
+    if window > 3 * 3600:
+        unit, seconds = "hours", 3600
+    tickvals = [window * i / 4 for i in range(5)]
+    return {
+        "range": [0, window],
+        "showline": True,
+        "zeroline": False,
+        "fixedrange": True,
+        "tickvals": tickvals,
+        "ticktext": ["{:g}".format((window - val) / seconds) for val in tickvals],
+        "title": "Time Elapsed ({})".format(unit),
+    }
+
+
+def gen_rollup_traces(window):
+    """
+    Mean, standard deviation and range of the wind speed over the window
+
+    :params window: window length in seconds
+    :returns: (traces, y axis range), None before the first reading
+    """
+
+    buckets = wind_rollups.window(window)
+    if buckets is None or not len(buckets.time):
+        return None
+
+    # buckets are drawn at their middle
+    x = buckets.time + buckets.resolution / 2 - (wind_rollups.last_time - window)
+    text = [
+        "{:.1f} mph, {:.0f}\u00b0".format(mean, direction)
+        for mean, direction in zip(buckets.mean, buckets.direction)
+    ]
+    traces = [
+        go.Scatter(
+            x=x, y=buckets.max, mode="lines", line={"width": 0}, hoverinfo="skip"
+        ),
+        go.Scatter(
+            x=x,
+            y=buckets.min,
+            mode="lines",
+            line={"width": 0},
+            fill="tonexty",
+            fillcolor="rgba(66, 196, 247, 0.3)",
+            hoverinfo="skip",
+        ),
+        go.Scatter(
+            x=x,
+            y=buckets.mean,
+            text=text,
+            line={"color": "#42C4F7"},
+            hoverinfo="text",
+            error_y={
+                "type": "data",
+                "array": buckets.std,
+                "thickness": 1.5,
+                "width": 2,
+                "color": "#B4E8FC",
+            },
+            mode="lines",
+        ),
+    ]
+    return traces, [min(0, buckets.min.min()), max(45, buckets.max.max())]
+
+
+def speed_range(readings):
+    """
+    Y axis of the wind speed graph, the top is rounded up to 5 mph so that
+    the axis rarely changes as readings arrive
+
+    :params readings: Readings shown
+    :returns: (range, nticks)
+    """
+
+    top = max(45, readings.speed.max() + readings.speed_error.max())
+    return (
+        [min(0, float(readings.speed.min())), math.ceil(top / 5) * 5],
+        max(6, int(round(readings.speed[-1] / 10))),
+    )
+
+
+def gen_wind_speed_figure(readings):
+    """
+    :params readings: Readings of the buffer
+    :returns: figure of the wind speed graph
+    """
 
     trace = go.Scatter(
-        y=df["Speed"],
+        y=readings.speed.round(SPEED_DECIMALS),
         line={"color": "#42C4F7"},
         hoverinfo="skip",
         error_y={
             "type": "data",
-            "array": df["SpeedError"],
+            "array": readings.speed_error.round(SPEED_DECIMALS),
             "thickness": 1.5,
             "width": 2,
             "color": "#B4E8FC",
@@ -206,51 +343,91 @@ def gen_wind_speed(interval):
         mode="lines",
     )
 
+    y_range, nticks = speed_range(readings)
     layout = go.Layout(
         plot_bgcolor=app_color["graph_bg"],
         paper_bgcolor=app_color["graph_bg"],
         font={"color": "#fff"},
         height=700,
-        xaxis={
-            "range": [0, 200],
-            "showline": True,
-            "zeroline": False,
-            "fixedrange": True,
-            "tickvals": [0, 50, 100, 150, 200],
-            "ticktext": ["200", "150", "100", "50", "0"],
-            "title": "Time Elapsed (sec)",
-        },
+        xaxis=dict(elapsed_axis(wind_buffer.size), title=buffer_axis_title),
         yaxis={
-            "range": [
-                min(0, min(df["Speed"])),
-                max(45, max(df["Speed"]) + max(df["SpeedError"])),
-            ],
+            "range": y_range,
             "showgrid": True,
             "showline": True,
             "fixedrange": True,
             "zeroline": False,
             "gridcolor": app_color["graph_line"],
-            "nticks": max(6, round(df["Speed"].iloc[-1] / 10)),
+            "nticks": nticks,
         },
     )
 
     return go.Figure(data=[trace], layout=layout)
 
 
-@app.callback(
-    Output("wind-direction", "figure"), [Input("wind-speed-update", "n_intervals")]
-)
-def gen_wind_direction(interval):
+def gen_wind_speed(readings, window, state):
+    """
+    Generate the wind speed graph.
+
+    Clients showing the buffer only receive the readings that arrived since
+    their last update, the figure is sent again when its axes change.
+
+    :params readings: Readings of the buffer
+    :params window: seconds of readings shown
+    :params state: window, time of the last reading and y axis of the graph
+    :returns: (figure, extendData, state)
+    """
+
+    last = float(readings.time[-1])
+    if window > wind_buffer.size:
+        rollup = gen_rollup_traces(window)
+        if rollup is None:
+            return no_update, no_update, no_update
+        traces, y_range = rollup
+        layout = go.Layout(
+            plot_bgcolor=app_color["graph_bg"],
+            paper_bgcolor=app_color["graph_bg"],
+            font={"color": "#fff"},
+            height=700,
+            showlegend=False,
+            xaxis=elapsed_axis(window),
+            yaxis={
+                "range": y_range,
+                "showgrid": True,
+                "showline": True,
+                "fixedrange": True,
+                "zeroline": False,
+                "gridcolor": app_color["graph_line"],
+            },
+        )
+        figure = go.Figure(data=traces, layout=layout)
+        return figure, no_update, {"window": window, "time": last}
+
+    new_state = {"window": window, "time": last, "yaxis": list(speed_range(readings))}
+    if (
+        state is None
+        or state.get("window") != window
+        or state.get("yaxis") != new_state["yaxis"]
+        or last < state["time"]
+    ):
+        return gen_wind_speed_figure(readings), no_update, new_state
+
+    new = readings.time > state["time"]
+    update = {
+        "y": [readings.speed[new].round(SPEED_DECIMALS)],
+        "error_y.array": [readings.speed_error[new].round(SPEED_DECIMALS)],
+    }
+    return no_update, [update, [0], wind_buffer.size], new_state
+
+
+def gen_wind_direction(readings):
     """
     Generate the wind direction graph.
 
-    :params interval: update the graph based on an interval
+    :params readings: Readings of the buffer
     """
 
-    total_time = get_current_time()
-    df = get_wind_data_by_id(total_time)
-    val = df["Speed"].iloc[-1]
-    direction = [0, (df["Direction"][0] - 20), (df["Direction"][0] + 20), 0]
+    val = readings.speed[-1]
+    direction = [0, (readings.direction[-1] - 20), (readings.direction[-1] + 20), 0]
 
     traces_scatterpolar = [
         {"r": [0, val, val, 0], "fillcolor": "#084E8A"},
@@ -287,47 +464,22 @@ def gen_wind_direction(interval):
     return go.Figure(data=data, layout=layout)
 
 
-@app.callback(
-    Output("wind-histogram", "figure"),
-    [Input("wind-speed-update", "n_intervals")],
-    [
-        State("wind-speed", "figure"),
-        State("bin-slider", "value"),
-        State("bin-auto", "value"),
-    ],
-)
-def gen_wind_histogram(interval, wind_speed_figure, slider_value, auto_state):
+def gen_wind_histogram(bins):
     """
     Genererate wind histogram graph.
 
-    :params interval: upadte the graph based on an interval
-    :params wind_speed_figure: current wind speed graph
-    :params slider_value: current slider value
-    :params auto_state: current auto state
+    :params bins: number of bins, None for unit bins
     """
 
-    wind_val = []
-
-    try:
-        # Check to see whether wind-speed has been plotted yet
-        if wind_speed_figure is not None:
-            wind_val = wind_speed_figure["data"][0]["y"]
-        if "Auto" in auto_state:
-            bin_val = np.histogram(
-                wind_val,
-                bins=range(int(round(min(wind_val))), int(round(max(wind_val)))),
-            )
-        else:
-            bin_val = np.histogram(wind_val, bins=slider_value)
-    except Exception as error:
-        raise PreventUpdate
+    summary = speed_histogram.summary(bins)
+    if summary is None or not len(summary.counts):
+        return no_update
 
-    avg_val = float(sum(wind_val)) / len(wind_val)
-    median_val = np.median(wind_val)
+    bin_val = (summary.counts, summary.edges)
+    avg_val = summary.mean
+    median_val = summary.median
 
-    pdf_fitted = rayleigh.pdf(
-        bin_val[1], loc=(avg_val) * 0.55, scale=(bin_val[1][-1] - bin_val[1][0]) / 3
-    )
+    pdf_fitted = rayleigh_fit(bin_val[1], avg_val)
 
     y_val = (pdf_fitted * max(bin_val[0]) * 20,)
     y_val_max = max(y_val[0])
@@ -423,19 +575,109 @@ def gen_wind_histogram(interval, wind_speed_figure, slider_value, auto_state):
     )
 
 
+# Builds of the shared figures run one at a time, so that the clients polling
+# during a build wait for it instead of repeating it
+shared_figures_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=2)
+def shared_wind_direction(last_id):
+    """
+    Wind direction figure shared by all the clients until the next refresh
+
+    :params last_id: id of the last reading of the buffer
+    :returns: figure dict
+    """
+
+    return gen_wind_direction(wind_buffer.latest()).to_plotly_json()
+
+
+@functools.lru_cache(maxsize=16)
+def shared_wind_histogram(last_id, bins):
+    """
+    Wind histogram figure shared by the clients with the same bins until the
+    next refresh
+
+    :params last_id: id of the last reading of the buffer
+    :params bins: number of bins, None for unit bins
+    :returns: figure dict, or no_update before the first reading
+    """
+
+    figure = gen_wind_histogram(bins)
+    return figure if figure is no_update else figure.to_plotly_json()
+
+
+def build_shared_figures(last_id):
+    """
+    Build the figures shared by the clients right after a refresh, in the
+    poller thread, so that the callbacks find them ready
+
+    :params last_id: id of the last reading of the buffer
+    """
+
+    with shared_figures_lock:
+        shared_wind_direction(last_id)
+        shared_wind_histogram(last_id, None)
+
+
+wind_buffer.on_refresh.append(build_shared_figures)
+wind_buffer.start()
+
+
 @app.callback(
-    Output("bin-auto", "value"),
-    [Input("bin-slider", "value")],
-    [State("wind-speed", "figure")],
+    [
+        Output("wind-speed", "figure"),
+        Output("wind-speed", "extendData"),
+        Output("wind-speed-state", "data"),
+        Output("wind-direction", "figure"),
+        Output("wind-histogram", "figure"),
+    ],
+    [Input("wind-speed-update", "n_intervals"), Input("wind-window", "value")],
+    [
+        State("wind-speed-state", "data"),
+        State("bin-slider", "value"),
+        State("bin-auto", "value"),
+    ],
 )
-def deselect_auto(slider_value, wind_speed_figure):
+def gen_wind_graphs(interval, window, state, slider_value, auto_state):
+    """
+    Generate the wind speed, direction and histogram graphs from one read of
+    the buffer.
+
+    :params interval: update the graphs based on an interval
+    :params window: seconds of readings shown by the wind speed graph
+    :params state: state of the wind speed graph
+    :params slider_value: current slider value
+    :params auto_state: current auto state
+    """
+
+    readings = wind_buffer.latest()
+    if not len(readings.speed):
+        raise PreventUpdate
+    advanced = state is None or state.get("time") != float(readings.time[-1])
+    if not advanced and state.get("window") == window:
+        raise PreventUpdate  # no reading arrived since the last update
+    if not advanced:
+        # only the window changed, the other graphs are up to date
+        return gen_wind_speed(readings, window, state) + (no_update, no_update)
+
+    last_id = wind_buffer.last_id
+    bins = None if "Auto" in auto_state else slider_value
+    with shared_figures_lock:
+        direction = shared_wind_direction(last_id)
+        histogram = shared_wind_histogram(last_id, bins)
+    return gen_wind_speed(readings, window, state) + (direction, histogram)
+
+
+@app.callback(Output("bin-auto", "value"), [Input("bin-slider", "value")])
+def deselect_auto(slider_value):
     """ Toggle the auto checkbox. """
 
     # prevent update if graph has no data
-    if not len(wind_speed_figure["data"]):
+    if not len(speed_histogram):
         raise PreventUpdate
 
-    if wind_speed_figure is not None and len(wind_speed_figure["data"][0]["y"]) > 5:
+    if len(speed_histogram) > 5:
         return [""]
     return ["Auto"]
 
@@ -1,9 +1,91 @@
+import atexit
+import logging
+import os
 import pathlib
 import sqlite3
+import threading
+import weakref
 import pandas as pd
 
 
-DB_FILE = pathlib.Path(__file__).resolve().parent.joinpath("wind-data.db").resolve()
+DB_FILE = pathlib.Path(
+    os.environ.get(
+        "WIND_DB", pathlib.Path(__file__).resolve().parent.joinpath("wind-data.db")
+    )
+).resolve()
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionPool:
+    """
+    Read-only connections to a SQLite file, one per thread.
+
+    Connections are opened lazily in read-only URI mode with a shared cache
+    and dropped along with their thread. Each connection keeps its prepared
+    statements, so the parameterized queries below are only compiled once
+    per thread.
+    """
+
+    def __init__(self, path, timeout=5.0):
+        """
+        :params path: SQLite database file
+        :params timeout: seconds to wait for a lock held by a writer
+        """
+
+        self.path = pathlib.Path(path)
+        self.timeout = timeout
+        self._connections = weakref.WeakKeyDictionary()  # thread -> connection
+        self.queries = 0  # connections handed out, one per query
+        self._lock = threading.Lock()
+        self._wal = False
+
+    def __len__(self):
+        return len(self._connections)
+
+    def _enable_wal(self):
+        # WAL lets readers run while a writer appends, it is a property of the
+        # file and can only be set through a writable connection
+        try:
+            con = sqlite3.connect(str(self.path), timeout=self.timeout)
+            try:
+                con.execute("PRAGMA journal_mode=WAL;")
+            finally:
+                con.close()
+        except sqlite3.Error:
+            logger.warning("Could not enable WAL on %s", self.path, exc_info=True)
+        self._wal = True
+
+    def connection(self):
+        """
+        :returns: sqlite3 connection of the current thread
+        """
+
+        thread = threading.current_thread()
+        with self._lock:
+            self.queries += 1
+            con = self._connections.get(thread)
+            if con is None:
+                if not self._wal:
+                    self._enable_wal()
+                uri = "{}?mode=ro&cache=shared".format(self.path.as_uri())
+                con = sqlite3.connect(
+                    uri, uri=True, timeout=self.timeout, check_same_thread=False
+                )
+                self._connections[thread] = con
+            return con
+
+    def close(self):
+        """Close all the connections, the pool reopens them on next use."""
+
+        with self._lock:
+            for con in self._connections.values():
+                con.close()
+            self._connections.clear()
+
+
+pool = ConnectionPool(DB_FILE)
+atexit.register(pool.close)
 
 
 def get_wind_data(start, end):
@@ -12,24 +94,69 @@ def get_wind_data(start, end):
 
     :params start: start row id
     :params end: end row id
-    :returns: pandas dataframe object 
+    :returns: pandas dataframe object
+    """
+
+    statement = (
+        "SELECT rowid AS id, Speed, SpeedError, Direction FROM Wind "
+        "WHERE rowid > ? AND rowid <= ?;"
+    )
+    return pd.read_sql_query(statement, pool.connection(), params=(start, end))
+
+
+def get_live_wind_data(after_id, limit):
+    """
+    Query the newest rows appended by the ingestion process
+
+    :params after_id: only rows with a greater id are returned
+    :params limit: maximum number of rows, the newest ones are kept
+    :returns: pandas dataframe object ordered by id
+    """
+
+    statement = (
+        "SELECT * FROM (SELECT rowid AS id, Time, Speed, SpeedError, Direction "
+        "FROM LiveWind WHERE rowid > ? ORDER BY rowid DESC LIMIT ?) ORDER BY id;"
+    )
+    return pd.read_sql_query(statement, pool.connection(), params=(after_id, limit))
+
+
+def get_live_wind_rows(after_id, limit):
+    """
+    Query the oldest rows appended by the ingestion process after a row
+
+    :params after_id: only rows with a greater id are returned
+    :params limit: maximum number of rows, the oldest ones are kept
+    :returns: pandas dataframe object ordered by id
+    """
+
+    statement = (
+        "SELECT rowid AS id, Time, Speed, SpeedError, Direction FROM LiveWind "
+        "WHERE rowid > ? ORDER BY rowid LIMIT ?;"
+    )
+    return pd.read_sql_query(statement, pool.connection(), params=(after_id, limit))
+
+
+def get_live_wind_history(span):
+    """
+    Query the rows appended by the ingestion process in the last seconds
+
+    :params span: seconds before the last row
+    :returns: pandas dataframe object ordered by id
     """
 
-    con = sqlite3.connect(str(DB_FILE))
-    statement = f'SELECT Speed, SpeedError, Direction FROM Wind WHERE rowid > "{start}" AND rowid <= "{end}";'
-    df = pd.read_sql_query(statement, con)
-    return df
+    statement = (
+        "SELECT rowid AS id, Time, Speed, SpeedError, Direction FROM LiveWind "
+        "WHERE Time > (SELECT MAX(Time) FROM LiveWind) - ? ORDER BY rowid;"
+    )
+    return pd.read_sql_query(statement, pool.connection(), params=(span,))
 
 
-def get_wind_data_by_id(id):
+def get_live_wind_last_id():
     """
-    Query a row from the Wind Table
+    Query the id of the last row appended by the ingestion process
 
-    :params id: a row id
-    :returns: pandas dataframe object 
+    :returns: row id, 0 when the table is empty
     """
 
-    con = sqlite3.connect(str(DB_FILE))
-    statement = f'SELECT * FROM Wind WHERE rowid = "{id}";'
-    df = pd.read_sql_query(statement, con)
-    return df
+    statement = "SELECT COALESCE(MAX(rowid), 0) FROM LiveWind;"
+    return pool.connection().execute(statement).fetchone()[0]
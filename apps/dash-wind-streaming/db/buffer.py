@@ -0,0 +1,249 @@
+import collections
+import logging
+import threading
+import numpy as np
+import pandas as pd
+
+from db.api import (
+    get_live_wind_data,
+    get_live_wind_history,
+    get_live_wind_last_id,
+    get_live_wind_rows,
+    get_wind_data,
+)
+
+
+logger = logging.getLogger(__name__)
+
+Readings = collections.namedtuple("Readings", "time, speed, speed_error, direction")
+
+COLUMNS = ("Time", "Speed", "SpeedError", "Direction")
+
+DAY = 24 * 3600
+
+
+class ReplaySource:
+    """
+    Rows of the static Wind table, whose rowid is the second of the day.
+
+    The table is replayed every day. Reading times count the seconds from the
+    midnight of the day the app started, so they keep increasing across days.
+    """
+
+    def __init__(self, now):
+        """
+        :params now: callable returning the id of the current row
+        """
+
+        self.now = now
+        self._day = 0
+        self._second = None
+
+    def _time(self):
+        second = self.now()
+        if self._second is not None and second < self._second:
+            self._day += 1  # the day wrapped around
+        self._second = second
+        return self._day * DAY + second
+
+    def _rows(self, start, end):
+        # the rows of each replayed day between the two times
+        frames = []
+        for offset in range(start // DAY * DAY, end, DAY):
+            df = get_wind_data(
+                max(start, offset) - offset, min(end, offset + DAY) - offset
+            )
+            df["Time"] = df["id"] + offset
+            frames.append(df)
+        return pd.concat(frames, ignore_index=True)
+
+    def read(self, last_id, limit):
+        """
+        :params last_id: id of the last row read, None to start over
+        :params limit: number of rows read when starting over
+        :returns: (new last id, dataframe of the rows after last_id, whether
+            the rows replace the previous ones)
+        """
+
+        end = self._time()
+        if last_id is not None and end <= last_id:
+            return last_id, None, False
+        start = end - limit if last_id is None else last_id
+        return end, self._rows(start, end), last_id is None
+
+    def history(self, span):
+        """
+        :params span: seconds of readings
+        :returns: dataframe of the rows of the last span seconds
+        """
+
+        end = self._time()
+        return self._rows(end - span, end)
+
+
+class LiveSource:
+    """
+    Rows appended to the LiveWind table by the ingestion process.
+
+    The rows appended since the last read are fetched in pages of
+    ``page_size``, so none is skipped however fast they arrive.
+    """
+
+    def __init__(self, page_size=10000):
+        self.page_size = page_size
+
+    def read(self, last_id, limit):
+        """
+        :params last_id: id of the last row read, None to start over
+        :params limit: number of rows read when starting over, the newest
+        :returns: (new last id, dataframe of the rows after last_id, whether
+            the rows replace the previous ones)
+        """
+
+        if last_id is None:
+            df = get_live_wind_data(-1, limit)
+        else:
+            df = self._rows_after(last_id)
+        if not len(df):
+            if last_id is not None and get_live_wind_last_id() < last_id:
+                return self.read(None, limit)  # the table was recreated
+            return last_id, None, False
+        return int(df["id"].iloc[-1]), df, last_id is None
+
+    def _rows_after(self, last_id):
+        frames = []
+        while True:
+            df = get_live_wind_rows(last_id, self.page_size)
+            frames.append(df)
+            if len(df) < self.page_size:
+                return pd.concat(frames, ignore_index=True)
+            last_id = int(df["id"].iloc[-1])
+
+    def history(self, span):
+        """
+        :params span: seconds of readings
+        :returns: dataframe of the rows of the last span seconds
+        """
+
+        return get_live_wind_history(span)
+
+
+class WindBuffer:
+    """
+    Ring buffer of the most recent wind readings, shared by all the callbacks.
+
+    One thread polls the source once per ``interval`` for the rows that
+    arrived since the last poll, so database reads do not grow with the
+    number of connected clients. The listeners receive every row read, the
+    buffer only keeps the newest ``size`` of them.
+    """
+
+    def __init__(self, source, size=200, interval=1.0, listeners=(), on_refresh=()):
+        """
+        :params source: ReplaySource or LiveSource
+        :params size: number of readings kept
+        :params interval: seconds between two polls
+        :params listeners: callables receiving the appended Readings and
+            whether the buffer was emptied before, after each refresh
+        :params on_refresh: callables receiving the new last_id once the
+            listeners are done, after each refresh
+        """
+
+        self.source = source
+        self.size = size
+        self.interval = interval
+        self.listeners = list(listeners)
+        self.on_refresh = list(on_refresh)
+        self._columns = np.zeros((len(COLUMNS), size))
+        self._head = 0  # position of the next reading
+        self._count = 0
+        self._last_id = None
+        self.last_id = None  # id of the last row passed to the listeners
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __len__(self):
+        return self._count
+
+    def start(self):
+        """ Fill the buffer and start the poller thread. """
+
+        if self._thread is None:
+            self._poll()
+            self._thread = threading.Thread(
+                target=self._run, name="wind-poller", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def refresh(self):
+        """
+        Append the rows that arrived since the last refresh
+
+        :returns: number of readings appended
+        """
+
+        last_id, df, reset = self.source.read(self._last_id, self.size)
+        if df is None:
+            return 0
+        values = df[list(COLUMNS)].values.T
+        count = values.shape[1]
+        kept = values[:, -self.size :]
+
+        with self._lock:
+            if reset:
+                self._head = self._count = 0
+            positions = (self._head + np.arange(kept.shape[1])) % self.size
+            self._columns[:, positions] = kept
+            self._head = (self._head + kept.shape[1]) % self.size
+            self._count = min(self._count + kept.shape[1], self.size)
+            self._last_id = last_id
+
+        readings = Readings(*values)
+        for listener in self.listeners:
+            listener(readings, reset)
+        self.last_id = last_id
+        for callback in self.on_refresh:
+            callback(last_id)
+        return count
+
+    def backfill(self, listener, span):
+        """
+        Pass the readings of the last ``span`` seconds to a listener that
+        keeps more history than the buffer
+
+        :params listener: callable receiving Readings and True
+        :params span: seconds of readings
+        """
+
+        try:
+            df = self.source.history(span)
+        except Exception:
+            logger.warning("Could not read the wind history", exc_info=True)
+            return
+        listener(Readings(*df[list(COLUMNS)].values.T), True)
+
+    def latest(self, n=None):
+        """
+        :params n: number of readings, all the buffered ones by default
+        :returns: Readings of arrays, oldest first
+        """
+
+        with self._lock:
+            n = self._count if n is None else min(n, self._count)
+            positions = (self._head - n + np.arange(n)) % self.size
+            return Readings(*self._columns[:, positions])
+
+    def _poll(self):
+        try:
+            self.refresh()
+        except Exception:
+            logger.warning("Could not poll wind readings", exc_info=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._poll()
@@ -0,0 +1,159 @@
+import argparse
+import math
+import sqlite3
+import time
+import numpy as np
+
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS LiveWind ("
+    "Time REAL NOT NULL, Speed REAL, SpeedError REAL, Direction REAL);",
+    "CREATE INDEX IF NOT EXISTS LiveWindTime ON LiveWind (Time);",
+)
+
+
+class SyntheticWind:
+    """
+    Random walk of wind readings, as generated in the notebook.
+    """
+
+    def __init__(self, seed=None):
+        self.random = np.random.RandomState(seed)
+        self.speed = 20
+        self.direction = self.random.uniform(0, 360)
+        self.count = 0
+
+    def __call__(self, n):
+        """
+        :params n: number of readings
+        :returns: list of (speed, speed error, direction)
+        """
+
+        rows = []
+        for _ in range(n):
+            speed = abs(self.random.normal(self.speed, 2))
+            error = abs(self.random.normal(round(self.speed / 10), 1))
+            swing = 50 if self.count % 100 == 0 else 5
+            self.direction = self.random.uniform(
+                self.direction - swing, self.direction + swing
+            )
+            if round(speed) > 45:
+                self.speed = int(math.floor(speed))
+            elif round(speed) < 10:
+                self.speed = int(math.ceil(speed))
+            else:
+                self.speed = int(round(speed))
+            self.count += 1
+            rows.append((speed, error, self.direction))
+        return rows
+
+
+class FileWind:
+    """
+    Readings of the static Wind table of a database, replayed in a loop.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        con = sqlite3.connect(str(path))
+        try:
+            self.rows = con.execute(
+                "SELECT Speed, SpeedError, Direction FROM Wind ORDER BY rowid;"
+            ).fetchall()
+        finally:
+            con.close()
+        if not self.rows:
+            raise ValueError("No readings in {}".format(path))
+        self.position = 0
+
+    def __call__(self, n):
+        rows = []
+        for _ in range(n):
+            rows.append(self.rows[self.position])
+            self.position = (self.position + 1) % len(self.rows)
+        return rows
+
+
+def connect(path):
+    """
+    :params path: database file
+    :returns: writable sqlite3 connection in WAL mode with the LiveWind table
+    """
+
+    con = sqlite3.connect(str(path), timeout=30)
+    con.execute("PRAGMA journal_mode=WAL;")
+    con.execute("PRAGMA synchronous=NORMAL;")  # durable at checkpoints with WAL
+    for statement in SCHEMA:
+        con.execute(statement)
+    con.commit()
+    return con
+
+
+def ingest(con, source, rate, batch=0.5, retention=3600, duration=None):
+    """
+    Append readings at a fixed rate, one transaction per batch
+
+    :params con: connection returned by connect
+    :params source: callable returning n (speed, speed error, direction)
+    :params rate: readings per second
+    :params batch: seconds of readings inserted per transaction
+    :params retention: seconds of readings kept, older ones are deleted
+    :params duration: seconds to run, forever by default
+    :returns: number of readings appended
+    """
+
+    start = time.time()
+    appended = 0
+    while duration is None or time.time() - start < duration:
+        # readings are timestamped at their due time, evenly spaced
+        due = int((time.time() - start) * rate) - appended
+        if due > 0:
+            times = start + (appended + np.arange(1, due + 1)) / rate
+            rows = [
+                (float(t), speed, error, direction)
+                for t, (speed, error, direction) in zip(times, source(due))
+            ]
+            with con:
+                con.executemany(
+                    "INSERT INTO LiveWind (Time, Speed, SpeedError, Direction) "
+                    "VALUES (?, ?, ?, ?);",
+                    rows,
+                )
+                con.execute(
+                    "DELETE FROM LiveWind WHERE Time < ?;", (times[-1] - retention,)
+                )
+            appended += due
+        time.sleep(batch)
+    return appended
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Append live wind readings to the database read by the app."
+    )
+    parser.add_argument(
+        "--db", required=True, help="database file, read by the app through WIND_DB"
+    )
+    parser.add_argument("--rate", type=float, default=10, help="readings per second")
+    parser.add_argument("--batch", type=float, default=0.5, help="seconds per insert")
+    parser.add_argument(
+        "--retention", type=float, default=3600, help="seconds of readings kept"
+    )
+    parser.add_argument(
+        "--replay", help="replay the Wind table of this database instead of random"
+    )
+    parser.add_argument("--duration", type=float, help="seconds to run")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    source = FileWind(args.replay) if args.replay else SyntheticWind(args.seed)
+    con = connect(args.db)
+    try:
+        count = ingest(
+            con, source, args.rate, args.batch, args.retention, args.duration
+        )
+        print("Appended {} readings to {}".format(count, args.db))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        con.close()
@@ -0,0 +1,140 @@
+import bisect
+import collections
+import functools
+import math
+import threading
+import numpy as np
+
+
+Summary = collections.namedtuple("Summary", "counts, edges, mean, median")
+
+
+class SlidingHistogram:
+    """
+    Histogram of the last ``size`` wind speed samples.
+
+    Adding a sample evicts the oldest one. The running sum, the counts of
+    unit wide bins and a sorted copy of the window are updated in place, so
+    the mean, the median and the counts are read without rescanning the
+    window on every refresh. Keeping the copy sorted moves O(size) items per
+    sample, which is cheap for the 200 samples of the app, and a batch
+    longer than the window rebuilds it with one sort instead.
+    """
+
+    def __init__(self, size=200):
+        """
+        :params size: number of samples in the window
+        """
+
+        self.size = size
+        self._window = collections.deque()
+        self._sorted = []
+        self._units = collections.Counter()  # floor(sample) -> count
+        self._total = 0.0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._window)
+
+    def clear(self):
+        with self._lock:
+            self._window.clear()
+            self._sorted = []
+            self._units.clear()
+            self._total = 0.0
+
+    def extend(self, samples):
+        """
+        :params samples: new samples, oldest first
+        """
+
+        with self._lock:
+            if len(samples) >= self.size:
+                self._rebuild([float(sample) for sample in samples[-self.size :]])
+                return
+            for sample in samples:
+                self._push(float(sample))
+
+    def _rebuild(self, samples):
+        self._window = collections.deque(samples)
+        self._sorted = sorted(samples)
+        self._units = collections.Counter(math.floor(sample) for sample in samples)
+        self._total = math.fsum(samples)
+
+    def _push(self, sample):
+        self._window.append(sample)
+        bisect.insort(self._sorted, sample)
+        self._units[math.floor(sample)] += 1
+        self._total += sample
+        if len(self._window) > self.size:
+            oldest = self._window.popleft()
+            del self._sorted[bisect.bisect_left(self._sorted, oldest)]
+            unit = math.floor(oldest)
+            self._units[unit] -= 1
+            if not self._units[unit]:
+                del self._units[unit]
+            self._total -= oldest
+
+    def _median(self):
+        n = len(self._sorted)
+        middle = n // 2
+        if n % 2:
+            return self._sorted[middle]
+        return (self._sorted[middle - 1] + self._sorted[middle]) / 2
+
+    def summary(self, bins=None):
+        """
+        Counts like np.histogram of the window
+
+        :params bins: number of equal width bins between the smallest and the
+            largest sample, or None for unit bins between their rounded values
+        :returns: Summary, None when the window is empty
+        """
+
+        with self._lock:
+            if not self._sorted:
+                return None
+            low, high = self._sorted[0], self._sorted[-1]
+            if bins is None:
+                edges = np.arange(int(round(low)), int(round(high)), dtype=float)
+                counts = np.array(
+                    [self._units[int(edge)] for edge in edges[:-1]], dtype=int
+                )
+                if len(counts):
+                    # the last bin includes its right edge
+                    right = bisect.bisect_right(self._sorted, edges[-1])
+                    counts[-1] += right - bisect.bisect_left(self._sorted, edges[-1])
+            else:
+                if low == high:
+                    low, high = low - 0.5, high + 0.5
+                edges = np.linspace(low, high, bins + 1)
+                positions = np.searchsorted(self._sorted, edges, side="left")
+                positions[-1] = len(self._sorted)
+                counts = np.diff(positions)
+            return Summary(
+                counts, edges, self._total / len(self._window), self._median()
+            )
+
+
+@functools.lru_cache(maxsize=32)
+def _rayleigh_grid(edges):
+    # the edges as an array and the scale fitted to their span
+    return np.array(edges), (edges[-1] - edges[0]) / 3
+
+
+def rayleigh_fit(edges, mean):
+    """
+    Rayleigh distribution fitted over the bin edges
+
+    The edges only change with the bins, their array and the scale are cached
+    and the location given by the mean is applied on each call.
+
+    :params edges: histogram bin edges
+    :params mean: mean wind speed
+    :returns: numpy array of the density at each edge
+    """
+
+    x, scale = _rayleigh_grid(tuple(edges))
+    with np.errstate(divide="ignore", invalid="ignore"):  # nan for edges without span
+        z = (x - mean * 0.55) / scale
+        return np.where(z >= 0, z * np.exp(-(z ** 2) / 2) / scale, 0.0)
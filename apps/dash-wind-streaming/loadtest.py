@@ -0,0 +1,368 @@
+import argparse
+import collections
+import http.client
+import json
+import os
+import pathlib
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import numpy as np
+import pandas as pd
+
+
+APP_PATH = pathlib.Path(__file__).resolve().parent
+
+# Route added to the server of the load test, reporting the database queries
+# and the CPU time of the worker answering
+STATS_ROUTE = "/_loadtest/stats"
+
+# Interval whose callbacks the clients fire
+INTERVAL_ID = "wind-speed-update"
+
+
+def write_db(path, seed=0):
+    """
+    Day of synthetic readings in a Wind table, as written by the notebook
+
+    :params path: database file
+    :params seed: random seed
+    """
+
+    from db.ingest import SyntheticWind
+
+    df = pd.DataFrame(
+        SyntheticWind(seed)(24 * 3600), columns=["Speed", "SpeedError", "Direction"]
+    )
+    con = sqlite3.connect(str(path))
+    try:
+        df.to_sql(name="Wind", con=con)
+    finally:
+        con.close()
+
+
+def stats_server():
+    """
+    Server of the app with the stats route, the gunicorn entry point of the
+    load test
+    """
+
+    import flask
+    from app import server
+    from db.api import pool
+
+    @server.route(STATS_ROUTE)
+    def stats():
+        times = os.times()
+        return flask.jsonify(
+            pid=os.getpid(), queries=pool.queries, cpu=times.user + times.system
+        )
+
+    return server
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(db, port, workers, dev_server):
+    """
+    :params db: database file
+    :params port: port bound on localhost
+    :params workers: number of gunicorn workers
+    :params dev_server: run the threaded Flask server instead of gunicorn
+    :returns: server Popen
+    """
+
+    if dev_server:
+        command = [sys.executable, __file__, "--serve", str(port)]
+    else:
+        command = [
+            "gunicorn",
+            "--pythonpath",
+            str(APP_PATH),
+            "--workers",
+            str(workers),
+            "--bind",
+            "127.0.0.1:{}".format(port),
+            "loadtest:stats_server()",
+        ]
+    return subprocess.Popen(
+        command, cwd=str(APP_PATH), env=dict(os.environ, WIND_DB=str(db))
+    )
+
+
+def get_json(port, path, timeout=10):
+    con = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+    try:
+        con.request("GET", path)
+        response = con.getresponse()
+        if response.status != 200:
+            raise IOError("GET {} returned {}".format(path, response.status))
+        return json.loads(response.read().decode())
+    finally:
+        con.close()
+
+
+def wait_for_server(server, port, timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("The server exited with {}".format(server.returncode))
+        try:
+            return get_json(port, STATS_ROUTE)
+        except (IOError, OSError):
+            time.sleep(0.5)
+    raise RuntimeError("The server did not start within {}s".format(timeout))
+
+
+def server_stats(port, workers):
+    """
+    Queries and CPU time summed over the workers, each request is answered by
+    any worker so the route is polled until every worker has answered
+
+    :returns: dict of pid to the worker stats
+    """
+
+    stats = {}
+    for _ in range(20 * workers):
+        worker = get_json(port, STATS_ROUTE)
+        stats[worker["pid"]] = worker
+        if len(stats) == workers:
+            break
+    return stats
+
+
+def layout_props(node, props=None):
+    """
+    :params node: Dash layout JSON
+    :returns: dict of component id to props
+    """
+
+    props = {} if props is None else props
+    if isinstance(node, list):
+        for child in node:
+            layout_props(child, props)
+    elif isinstance(node, dict) and "props" in node:
+        if "id" in node["props"]:
+            props[node["props"]["id"]] = node["props"]
+        layout_props(node["props"].get("children"), props)
+    return props
+
+
+def run_client(port, callbacks, props, interval, delay, deadline, latencies, counts):
+    """
+    Fire the interval callbacks like a browser, one request at a time
+
+    :params callbacks: dependencies of the callbacks triggered by the interval
+    :params props: dict of component id to props, updated by the responses
+    :params interval: seconds between two ticks
+    :params delay: seconds before the first tick
+    :params deadline: time after which no tick is fired
+    :params latencies: list receiving the seconds of each request
+    :params counts: Counter receiving the response statuses and bytes
+    """
+
+    con = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    headers = {"Content-Type": "application/json"}
+    tick = time.time() + delay
+    n_intervals = 0
+    while tick < deadline:
+        time.sleep(max(0, tick - time.time()))
+        n_intervals += 1
+        props[INTERVAL_ID]["n_intervals"] = n_intervals
+
+        for callback in callbacks:
+            body = {
+                "output": callback["output"],
+                "inputs": [
+                    dict(dep, value=props[dep["id"]].get(dep["property"]))
+                    for dep in callback["inputs"]
+                ],
+                "state": [
+                    dict(dep, value=props[dep["id"]].get(dep["property"]))
+                    for dep in callback["state"]
+                ],
+                "changedPropIds": ["{}.n_intervals".format(INTERVAL_ID)],
+            }
+            start = time.perf_counter()
+            try:
+                con.request(
+                    "POST", "/_dash-update-component", json.dumps(body), headers
+                )
+                response = con.getresponse()
+                data = response.read()
+            except (IOError, OSError, http.client.HTTPException):
+                counts["error"] += 1
+                con.close()
+                continue
+            latencies.append(time.perf_counter() - start)
+            counts[response.status] += 1
+            counts["bytes"] += len(data)
+
+            if response.status == 200:
+                for id, values in json.loads(data.decode())["response"].items():
+                    props[id].update(values)
+        tick += interval
+    con.close()
+
+
+def run(port, clients, duration, interval, window, workers):
+    """
+    Load the server with concurrent clients
+
+    :params clients: number of simulated browsers
+    :params duration: seconds of load
+    :params interval: seconds between two ticks, the layout one by default
+    :params window: seconds shown by the wind speed graph
+    :returns: OrderedDict of the results
+    """
+
+    layout = layout_props(get_json(port, "/_dash-layout"))
+    callbacks = [
+        callback
+        for callback in get_json(port, "/_dash-dependencies")
+        if any(dep["id"] == INTERVAL_ID for dep in callback["inputs"])
+    ]
+    if interval is None:
+        interval = layout[INTERVAL_ID]["interval"] / 1000
+    layout["wind-window"]["value"] = window
+
+    latencies = [[] for _ in range(clients)]
+    counts = [collections.Counter() for _ in range(clients)]
+    deadline = time.time() + duration
+    threads = [
+        threading.Thread(
+            target=run_client,
+            args=(
+                port,
+                callbacks,
+                json.loads(json.dumps(layout)),  # each client has its own props
+                interval,
+                random.uniform(0, interval),
+                deadline,
+                latencies[i],
+                counts[i],
+            ),
+            daemon=True,
+        )
+        for i in range(clients)
+    ]
+
+    before = server_stats(port, workers)
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - start
+    after = server_stats(port, workers)
+
+    pids = set(before) & set(after)
+    queries = sum(after[pid]["queries"] - before[pid]["queries"] for pid in pids)
+    cpu = sum(after[pid]["cpu"] - before[pid]["cpu"] for pid in pids)
+    latencies = np.array(sum(latencies, [])) * 1000
+    counts = sum(counts, collections.Counter())
+    requests = len(latencies)
+    if not requests:
+        latencies = np.zeros(1)
+    return collections.OrderedDict(
+        [
+            ("clients", clients),
+            ("interval", interval),
+            ("requests", requests),
+            ("requests_per_s", requests / elapsed),
+            ("errors", counts["error"]),
+            ("no_update", counts[204]),
+            ("bytes_per_request", counts["bytes"] / max(requests, 1)),
+            ("p50_ms", float(np.percentile(latencies, 50))),
+            ("p95_ms", float(np.percentile(latencies, 95))),
+            ("p99_ms", float(np.percentile(latencies, 99))),
+            ("max_ms", float(latencies.max())),
+            ("queries_per_s", queries / elapsed),
+            ("cpu_percent", 100 * cpu / elapsed),
+            ("workers_measured", len(pids)),
+        ]
+    )
+
+
+def print_results(results):
+    print(
+        "{:>8} {:>9} {:>7} {:>9} {:>9} {:>9} {:>10} {:>8} {:>7}".format(
+            "clients",
+            "req/s",
+            "errors",
+            "p50 ms",
+            "p95 ms",
+            "p99 ms",
+            "queries/s",
+            "cpu %",
+            "KiB/req",
+        )
+    )
+    for result in results:
+        print(
+            "{clients:>8} {requests_per_s:>9.1f} {errors:>7} {p50_ms:>9.1f} "
+            "{p95_ms:>9.1f} {p99_ms:>9.1f} {queries_per_s:>10.1f} "
+            "{cpu_percent:>8.1f} {kib:>7.1f}".format(
+                kib=result["bytes_per_request"] / 1024, **result
+            )
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Simulate browsers showing the app and report the callback "
+        "latency, database queries and worker CPU."
+    )
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 10, 50, 100])
+    parser.add_argument("--duration", type=float, default=30, help="seconds per run")
+    parser.add_argument(
+        "--interval", type=float, help="seconds between ticks, the app's by default"
+    )
+    parser.add_argument("--window", type=int, default=200, help="speed graph window")
+    parser.add_argument("--workers", type=int, default=1, help="gunicorn workers")
+    parser.add_argument(
+        "--dev-server",
+        action="store_true",
+        help="serve with the threaded Flask server instead of gunicorn",
+    )
+    parser.add_argument(
+        "--db",
+        default=os.path.join(tempfile.gettempdir(), "dash-wind-loadtest.db"),
+        help="generated database, reused across runs",
+    )
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        stats_server().run(host="127.0.0.1", port=args.serve, threaded=True)
+        sys.exit()
+
+    if not os.path.exists(args.db):
+        write_db(args.db)
+
+    port = free_port()
+    server = start_server(args.db, port, args.workers, args.dev_server)
+    try:
+        wait_for_server(server, port)
+        results = [
+            run(port, clients, args.duration, args.interval, args.window, args.workers)
+            for clients in args.clients
+        ]
+    finally:
+        server.terminate()
+        server.wait()
+    print_results(results)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,164 @@
+import collections
+import math
+import threading
+import numpy as np
+
+
+# Bucket widths in seconds, finest first
+RESOLUTIONS = (10, 60, 600)
+
+Buckets = collections.namedtuple(
+    "Buckets", "time, count, min, mean, max, std, direction, resolution"
+)
+
+
+class Rollup:
+    """
+    Ring of fixed width time buckets summarizing the wind readings.
+
+    Each bucket keeps the count, sum and sum of squares of the speeds, their
+    extremes and the sums of the direction sines and cosines, so readings are
+    folded in as they arrive and the statistics are derived when read.
+    """
+
+    def __init__(self, resolution, span):
+        """
+        :params resolution: bucket width in seconds
+        :params span: seconds of readings kept
+        """
+
+        self.resolution = resolution
+        self.capacity = int(math.ceil(span / resolution)) + 1
+        self._bucket = np.full(self.capacity, np.iinfo(np.int64).min)  # slot -> id
+        self._count = np.zeros(self.capacity)
+        self._sum = np.zeros(self.capacity)
+        self._squares = np.zeros(self.capacity)
+        self._min = np.zeros(self.capacity)
+        self._max = np.zeros(self.capacity)
+        self._sin = np.zeros(self.capacity)
+        self._cos = np.zeros(self.capacity)
+
+    def add(self, times, speed, direction):
+        """
+        :params times: reading times in seconds, increasing
+        :params speed: wind speeds
+        :params direction: wind directions in degrees
+        """
+
+        if not len(times):
+            return
+        buckets = np.floor_divide(times, self.resolution).astype(np.int64)
+        keep = buckets > buckets[-1] - self.capacity
+        buckets, speed, direction = buckets[keep], speed[keep], direction[keep]
+        slots = buckets % self.capacity
+
+        # slots still holding an older bucket start over
+        stale = np.unique(slots[self._bucket[slots] != buckets])
+        self._bucket[slots] = buckets
+        for column in (self._count, self._sum, self._squares, self._sin, self._cos):
+            column[stale] = 0
+        self._min[stale] = np.inf
+        self._max[stale] = -np.inf
+
+        radians = np.radians(direction)
+        np.add.at(self._count, slots, 1)
+        np.add.at(self._sum, slots, speed)
+        np.add.at(self._squares, slots, speed ** 2)
+        np.add.at(self._sin, slots, np.sin(radians))
+        np.add.at(self._cos, slots, np.cos(radians))
+        np.minimum.at(self._min, slots, speed)
+        np.maximum.at(self._max, slots, speed)
+
+    def window(self, start, end):
+        """
+        :params start: time of the first reading, in seconds
+        :params end: time of the last reading, in seconds
+        :returns: Buckets of arrays, one item per bucket holding readings
+        """
+
+        ids = np.arange(
+            math.floor(start / self.resolution), math.floor(end / self.resolution) + 1
+        )
+        slots = ids % self.capacity
+        valid = (self._bucket[slots] == ids) & (self._count[slots] > 0)
+        ids, slots = ids[valid], slots[valid]
+
+        count = self._count[slots]
+        mean = self._sum[slots] / count
+        variance = np.maximum(self._squares[slots] / count - mean ** 2, 0)
+        direction = np.degrees(np.arctan2(self._sin[slots], self._cos[slots])) % 360
+        return Buckets(
+            ids * self.resolution,
+            count,
+            self._min[slots],
+            mean,
+            self._max[slots],
+            np.sqrt(variance),
+            direction,
+            self.resolution,
+        )
+
+
+class Rollups:
+    """
+    Rollups of the wind readings at several resolutions.
+
+    A window is served from the finest resolution giving at most
+    ``max_points`` buckets, so long windows cost about as much to read and
+    draw as short ones.
+    """
+
+    def __init__(self, span=24 * 3600, resolutions=RESOLUTIONS, max_points=400):
+        """
+        :params span: seconds of readings kept
+        :params resolutions: bucket widths in seconds, finest first
+        :params max_points: largest number of buckets returned by window
+        """
+
+        self.span = span
+        self.max_points = max_points
+        self.rollups = [Rollup(resolution, span) for resolution in resolutions]
+        self.last_time = None
+        self._lock = threading.Lock()
+
+    def add(self, readings, reset=False):
+        """
+        Fold in new readings, the ones older than the last reading are ignored
+
+        :params readings: Readings of arrays, oldest first
+        :params reset: unused, the rollups only go forward in time
+        """
+
+        times = np.asarray(readings.time, dtype=float)
+        with self._lock:
+            if self.last_time is not None:
+                newer = times > self.last_time
+                readings = readings._make(column[newer] for column in readings)
+                times = times[newer]
+            if not len(times):
+                return
+            for rollup in self.rollups:
+                rollup.add(times, readings.speed, readings.direction)
+            self.last_time = times[-1]
+
+    def resolution(self, span):
+        """
+        :params span: window length in seconds
+        :returns: Rollup serving the window
+        """
+
+        for rollup in self.rollups:
+            if span / rollup.resolution <= self.max_points:
+                return rollup
+        return self.rollups[-1]
+
+    def window(self, span):
+        """
+        :params span: window length in seconds, up to the last reading
+        :returns: Buckets of arrays, None before the first reading
+        """
+
+        with self._lock:
+            if self.last_time is None:
+                return None
+            return self.resolution(span).window(self.last_time - span, self.last_time)